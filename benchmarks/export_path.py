@@ -0,0 +1,253 @@
+# Natalia Raz
+# Export-path benchmark for shotlist_creator2 against the in-process fake Resolve (fake_resolve.py).
+# Every scenario runs in a fresh interpreter and reports wall time, per-marker cost, peak RSS and
+# output size; results are compared with benchmarks/baselines.json and regressions fail the run.
+# Usage: python benchmarks/export_path.py [--markers 100,1000] [--sizes HD,4K] [--modes ...]
+#        [--latency 0.0] [--full] [--tolerance 0.25] [--save-baseline]
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Repository root, where shotlist_creator2.py and fake_resolve.py live
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_PATH)
+
+# Baseline results, one entry per scenario name
+BASELINE_PATH = os.path.join(REPO_PATH, "benchmarks", "baselines.json")
+
+# Still sizes of the synthetic stills
+STILL_SIZES = {"HD": (1920, 1080), "4K": (3840, 2160), "6K": (6144, 3456)}
+
+# What each mode drives:
+#   collect    the marker loop only (seek, grab, clip metadata)
+#   serial     collect_markers + export_markers, one phase after another
+#   pipeline   run_pipeline (grab, export, resize and write overlapped)
+#   timecodes  frames_to_timecodes / timecodes_to_frames over the marker frames
+#   writer-memory    ShotlistWriter rows with a distinct thumbnail each, workbook kept in memory
+#   writer-constant  the same rows with the constant-memory writer
+#   encode-*   encoding one LARGE thumbnail of a detailed still per marker as png, png8 or jpeg
+MODES = [
+    "collect", "serial", "pipeline", "timecodes", "writer-memory", "writer-constant",
+    "encode-png", "encode-png8", "encode-jpeg",
+]
+
+# Modes that don't touch stills run once per marker count
+SIZELESS_MODES = {"timecodes", "writer-memory", "writer-constant", "encode-png", "encode-png8", "encode-jpeg"}
+
+# Modes that only write a workbook; they always run 100/1k/10k rows unless --markers is given
+WRITER_MODES = {"writer-memory", "writer-constant"}
+WRITER_MARKERS = [100, 1000, 10000]
+
+# Default matrix: small enough to run before every review; --full runs 100/1k/10k x HD/4K/6K
+DEFAULT_MARKERS = [100, 1000]
+DEFAULT_SIZES = ["HD"]
+FULL_MARKERS = [100, 1000, 10000]
+
+# Slowdowns smaller than this many seconds are never reported as regressions
+MIN_REGRESSION_S = 0.05
+
+# Function to name a scenario, e.g. "pipeline/1000/HD"
+def scenario_name(mode, marker_count, size_name):
+    if mode in SIZELESS_MODES:
+        return f"{mode}/{marker_count}"
+    return f"{mode}/{marker_count}/{size_name}"
+
+# Function to add up the size of every file in a folder
+def folder_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+# Function to read the peak resident set size of this process in MB (None where unsupported)
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1048576 if sys.platform == "darwin" else peak / 1024
+
+# Function to run one scenario in this process and return its measurements
+def run_scenario(mode, marker_count, size_name, latency):
+    import shotlist_creator2 as shotlist
+    from fake_resolve import create_fake_resolve
+
+    work_path = tempfile.mkdtemp(prefix="shotlist_bench_")
+    resolve = create_fake_resolve(marker_count, latency, STILL_SIZES[size_name])
+    project = resolve.GetProjectManager().GetCurrentProject()
+    timeline = project.GetCurrentTimeline()
+    # The shared thumbnail cache would turn every rerun into cache hits
+    options = shotlist.ExportOptions(conflict_policy="replace", thumbnail_cache=False, pipelined=mode == "pipeline")
+    output_path = None
+
+    start = time.perf_counter()
+    if mode == "collect":
+        shotlist.collect_markers(resolve, project, timeline, options, shotlist.ClipPropertyCache())
+    elif mode in ("serial", "pipeline"):
+        output = shotlist.prepare_output(os.path.join(work_path, "bench.xlsx"), "replace")
+        shotlist.run_export(resolve, project, timeline, output.path, output.excel_filename, options, shotlist.ClipPropertyCache())
+        output_path = output.publish()
+    elif mode == "timecodes":
+        fps, drop_frame = 29.97, True
+        frames = list(timeline.GetMarkers())
+        for _ in range(10):
+            timecodes = shotlist.frames_to_timecodes(frames, fps, drop_frame, 86400)
+            shotlist.timecodes_to_frames(timecodes, fps, drop_frame, 86400)
+    elif mode.startswith("encode-"):
+        thumbnail_image = detailed_thumbnail(STILL_SIZES[size_name], shotlist.IMAGE_SIZES["LARGE"])
+        encoded_bytes = 0
+        start = time.perf_counter()
+        for _ in range(marker_count):
+            encoded_bytes += len(shotlist.encode_image(thumbnail_image, mode[len("encode-"):]))
+    elif mode in WRITER_MODES:
+        output_path = work_path
+        data_row = {field: f"{field} value" for field in options.selected_fields}
+        writer = shotlist.ShotlistWriter(
+            os.path.join(work_path, "writer.xlsx"), options.selected_fields, mode == "writer-constant"
+        )
+        for row in range(1, marker_count + 1):
+            # Making the thumbnail isn't part of the writer's time
+            made = time.perf_counter()
+            thumbnail = row_thumbnail(shotlist, row, options.image_size)
+            start += time.perf_counter() - made
+            writer.write_row(row, data_row, f"thumb{row:03d}.png", thumbnail)
+        writer.close()
+    wall_time = time.perf_counter() - start
+
+    result = {
+        "wall_s": wall_time,
+        "per_marker_ms": wall_time * 1000 / marker_count,
+        "peak_rss_mb": peak_rss_mb(),
+        "output_mb": (
+            encoded_bytes / 1048576 if mode.startswith("encode-")
+            else folder_size(output_path) / 1048576 if output_path else 0.0
+        ),
+        "resolve_calls": sum(resolve.calls.values()),
+    }
+    shutil.rmtree(work_path, ignore_errors=True)
+    return result
+
+# Function to make a distinct 16:9 thumbnail for a row of the writer modes (a gradient tinted
+# by the row number, with the number drawn on it); the workbook embeds identical images only
+# once, so a shared thumbnail would measure next to nothing
+def row_thumbnail(shotlist, row, max_size):
+    from PIL import Image, ImageDraw
+
+    size = (int(max_size), int(max_size * 9 / 16))
+    image = Image.merge("RGB", [
+        Image.linear_gradient("L").resize(size),
+        Image.new("L", size, row * 37 % 256),
+        Image.new("L", size, row // 256 * 61 % 256),
+    ])
+    ImageDraw.Draw(image).text((8, 8), f"row {row}", fill=(255, 255, 255))
+    return shotlist.encode_image(image, "png"), size[0], size[1]
+
+# Function to make a thumbnail of a detailed (fractal) still, which encodes like real footage
+# rather than like the flat synthetic stills
+def detailed_thumbnail(still_size, max_size):
+    from PIL import Image
+
+    still = Image.merge("RGB", [
+        Image.effect_mandelbrot(still_size, (-2.0, -1.2, 1.0, 1.2), 100),
+        Image.linear_gradient("L").resize(still_size),
+        Image.radial_gradient("L").resize(still_size),
+    ])
+    still.thumbnail((max_size, max_size), Image.BICUBIC)
+    return still
+
+# Function to run one scenario in a fresh interpreter, so imports and peak RSS are its own
+def measure(mode, marker_count, size_name, latency):
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-scenario", mode, str(marker_count), size_name, str(latency)],
+        cwd=REPO_PATH, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{scenario_name(mode, marker_count, size_name)} failed:\n{completed.stderr}")
+    # The export prints progress; the result is the last line
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def load_baselines():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH, encoding="utf-8") as baseline_file:
+        return json.load(baseline_file)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the shotlist export path against a fake Resolve.")
+    parser.add_argument("--markers", help="comma-separated marker counts (default 100,1000)")
+    parser.add_argument("--sizes", help="comma-separated still sizes: HD, 4K, 6K (default HD)")
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated modes to run")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every fake Resolve call")
+    parser.add_argument("--full", action="store_true", help="run 100/1k/10k markers at HD, 4K and 6K")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown or growth over the baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baselines")
+    parser.add_argument("--run-scenario", nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        mode, marker_count, size_name, latency = args.run_scenario
+        print(json.dumps(run_scenario(mode, int(marker_count), size_name, float(latency))))
+        return 0
+
+    marker_counts = FULL_MARKERS if args.full else DEFAULT_MARKERS
+    size_names = list(STILL_SIZES) if args.full else DEFAULT_SIZES
+    if args.markers:
+        marker_counts = [int(count) for count in args.markers.split(",")]
+    if args.sizes:
+        size_names = [name.strip().upper() for name in args.sizes.split(",")]
+    modes = [mode.strip() for mode in args.modes.split(",")]
+
+    baselines = load_baselines()
+    results = {}
+    regressions = []
+    print(f"{'Scenario':<24}{'Wall s':>10}{'ms/marker':>11}{'Peak MB':>9}{'Output MB':>11}{'vs base':>9}")
+    for mode in modes:
+        for marker_count in WRITER_MARKERS if mode in WRITER_MODES and not args.markers else marker_counts:
+            for size_name in size_names[:1] if mode in SIZELESS_MODES else size_names:
+                name = scenario_name(mode, marker_count, size_name)
+                result = measure(mode, marker_count, size_name, args.latency)
+                result["latency"] = args.latency
+                results[name] = result
+
+                # Compare with the baseline measured at the same fake latency
+                change = ""
+                baseline = baselines.get(name)
+                if baseline and baseline.get("latency") == args.latency:
+                    ratio = result["wall_s"] / baseline["wall_s"]
+                    change = f"{(ratio - 1) * 100:+.0f}%"
+                    # Differences of a few milliseconds are noise, not regressions
+                    if ratio > 1 + args.tolerance and result["wall_s"] - baseline["wall_s"] > MIN_REGRESSION_S:
+                        regressions.append(f"{name}: wall time {result['wall_s']:.2f}s vs {baseline['wall_s']:.2f}s")
+                    if baseline["output_mb"] and result["output_mb"] > baseline["output_mb"] * (1 + args.tolerance):
+                        regressions.append(f"{name}: output {result['output_mb']:.1f} MB vs {baseline['output_mb']:.1f} MB")
+
+                peak = f"{result['peak_rss_mb']:.0f}" if result["peak_rss_mb"] is not None else "-"
+                print(
+                    f"{name:<24}{result['wall_s']:>10.2f}{result['per_marker_ms']:>11.2f}"
+                    f"{peak:>9}{result['output_mb']:>11.1f}{change:>9}"
+                )
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as baseline_file:
+            json.dump(dict(sorted(baselines.items())), baseline_file, indent=2)
+            baseline_file.write("\n")
+        print(f"Baselines saved to {BASELINE_PATH}")
+    if regressions:
+        print(f"FAIL: slower or larger than the baseline by more than {args.tolerance * 100:.0f}%:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+# Natalia Raz
+# Import-time benchmark for shotlist_creator2 (python -X importtime).
+# Fails when a heavy dependency is loaded at import or the import takes longer than the budget.
+# Usage: python benchmarks/import_time.py [--runs 5] [--budget-ms 150]
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Repository root, where shotlist_creator2.py lives
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported by the code paths that need them
+DEFERRED_MODULES = ["xlsxwriter", "PIL", "PySide6", "pynput", "DaVinciResolveScript", "concurrent.futures"]
+
+# Function to import the script once in a fresh interpreter and return {module: (self_us, cumulative_us)}
+def measure_once():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import shotlist_creator2"],
+        cwd=REPO_PATH, capture_output=True, text=True, check=True,
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how long importing shotlist_creator2 takes.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    # The first run warms the bytecode cache
+    measure_once()
+    runs = [measure_once() for _ in range(args.runs)]
+    totals = [timings["shotlist_creator2"][1] / 1000 for timings in runs]
+    median = statistics.median(totals)
+    print(f"import shotlist_creator2: median {median:.1f} ms, min {min(totals):.1f} ms over {args.runs} runs")
+
+    print("Slowest imports (cumulative, last run):")
+    slowest = sorted(runs[-1].items(), key=lambda item: item[1][1], reverse=True)[:10]
+    for name, (_, cumulative_us) in slowest:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    loaded = [name for name in DEFERRED_MODULES if name in runs[-1]]
+    failed = False
+    if loaded:
+        print(f"FAIL: imported at module load: {', '.join(loaded)}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"FAIL: median import time {median:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+# Natalia Raz
+# Timecode conversion benchmark for shotlist_creator2: frames_to_timecodes and timecodes_to_frames
+# over a long batch of marker frames at every supported rate, drop-frame included.
+# Fails when converting one frame takes longer than the budget.
+# Usage: python benchmarks/timecodes.py [--frames 100000] [--runs 5] [--budget-us 10.0]
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Repository root, where shotlist_creator2.py lives
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_PATH)
+
+# Start frame of a timeline starting at 01:00:00:00, as Resolve timelines do by default
+START_FRAME = 86400
+
+# Function to time one conversion of the batch each way and return (to_timecodes_s, to_frames_s)
+def measure_once(shotlist, frames, rate):
+    start = time.perf_counter()
+    timecodes = shotlist.frames_to_timecodes(frames, rate, start_frame=START_FRAME)
+    middle = time.perf_counter()
+    converted = shotlist.timecodes_to_frames(timecodes, rate, start_frame=START_FRAME)
+    end = time.perf_counter()
+    if converted != frames:
+        raise AssertionError(f"{rate}: timecodes did not convert back to the same frames")
+    return middle - start, end - middle
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure batch frame/timecode conversion.")
+    parser.add_argument("--frames", type=int, default=100000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-us", type=float, default=10.0, help="per-frame budget for each direction")
+    args = parser.parse_args()
+
+    import shotlist_creator2 as shotlist
+
+    frames = list(range(args.frames))
+    failed = False
+    print(f"{args.frames} frames, median of {args.runs} runs (per frame)")
+    for rate in sorted(shotlist.TIMECODE_RATES):
+        runs = [measure_once(shotlist, frames, rate) for _ in range(args.runs)]
+        to_timecodes = statistics.median(run[0] for run in runs) * 1e6 / args.frames
+        to_frames = statistics.median(run[1] for run in runs) * 1e6 / args.frames
+        print(f"  {rate:>8}  to timecodes {to_timecodes:6.3f} us  to frames {to_frames:6.3f} us")
+        if max(to_timecodes, to_frames) > args.budget_us:
+            print(f"FAIL: {rate} is over the {args.budget_us:g} us per frame budget")
+            failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,380 @@
+# Natalia Raz
+# In-process stand-in for the DaVinci Resolve scripting objects used by shotlist_creator2
+# (timeline, markers, gallery/album, media pool items), with configurable per-call latency.
+# Used by the headless CLI (--fake-markers) to run and benchmark exports without Resolve.
+
+import os
+import time
+from collections import Counter
+
+from PIL import Image, ImageDraw
+
+# Marker colors cycled through by the synthetic timeline
+FAKE_MARKER_COLORS = ["Blue", "Red", "Green", "Yellow", "Cyan", "Purple", "Rose", "Sky"]
+
+# Class shared by every fake object: per-call latency and call counting
+class FakeResolveObject:
+    def __init__(self, session):
+        self.session = session
+
+    def _call(self, name):
+        self.session.calls[name] += 1
+        latency = self.session.latency
+        if isinstance(latency, dict):
+            latency = latency.get(name, latency.get("default", 0))
+        if latency:
+            time.sleep(latency)
+
+# Class holding the state shared by one fake Resolve instance
+class FakeSession:
+    def __init__(self, latency=0.0):
+        # Seconds per call, or a dict of method name -> seconds (with an optional "default")
+        self.latency = latency
+        self.calls = Counter()
+
+# Class for a media pool item with a fixed set of clip properties
+class FakeMediaPoolItem(FakeResolveObject):
+    def __init__(self, session, unique_id, name, properties):
+        super().__init__(session)
+        self.unique_id = unique_id
+        self.name = name
+        self.properties = properties
+
+    def GetUniqueId(self):
+        self._call("GetUniqueId")
+        return self.unique_id
+
+    def GetName(self):
+        self._call("GetName")
+        return self.name
+
+    def GetClipProperty(self, name=None):
+        self._call("GetClipProperty")
+        if name is not None:
+            return self.properties.get(name, "")
+        return dict(self.properties)
+
+# Class for a video item placed on a timeline track
+class FakeTimelineItem(FakeResolveObject):
+    def __init__(self, session, name, start, end, media_pool_item, color):
+        super().__init__(session)
+        self.name = name
+        self.start = start
+        self.end = end
+        self.media_pool_item = media_pool_item
+        # Background color of the stills grabbed on this item
+        self.color = color
+
+    def GetName(self):
+        self._call("GetName")
+        return self.name
+
+    def GetStart(self):
+        self._call("GetStart")
+        return self.start
+
+    def GetEnd(self):
+        self._call("GetEnd")
+        return self.end
+
+    def GetMediaPoolItem(self):
+        self._call("GetMediaPoolItem")
+        return self.media_pool_item
+
+    def GetLeftOffset(self):
+        self._call("GetLeftOffset")
+        return 0
+
+# Class for a still grabbed from the timeline
+class FakeGalleryStill:
+    def __init__(self, timeline_item, frame, size):
+        self.timeline_item = timeline_item
+        self.frame = frame
+        self.size = size
+
+    # Render the still: the clip color with a block whose position follows the frame
+    def render(self):
+        color = self.timeline_item.color if self.timeline_item else (0, 0, 0)
+        image = Image.new("RGB", self.size, color)
+        width, height = self.size
+        block = max(width // 8, 1)
+        left = (self.frame * 37) % max(width - block, 1)
+        top = (self.frame * 17) % max(height - block, 1)
+        ImageDraw.Draw(image).rectangle((left, top, left + block, top + block), fill=(255, 255, 255))
+        return image
+
+# Class for the current still album of a gallery
+class FakeGalleryStillAlbum(FakeResolveObject):
+    def __init__(self, session):
+        super().__init__(session)
+        self.stills = []
+        self.labels = {}
+
+    def GetStills(self):
+        self._call("GetStills")
+        return list(self.stills)
+
+    def GetLabel(self, still):
+        self._call("GetLabel")
+        return self.labels.get(id(still), "")
+
+    def SetLabel(self, still, label):
+        self._call("SetLabel")
+        self.labels[id(still)] = label
+        return True
+
+    def DeleteStills(self, stills):
+        self._call("DeleteStills")
+        doomed = {id(still) for still in stills}
+        self.stills = [still for still in self.stills if id(still) not in doomed]
+        return True
+
+    # Files are named <prefix>_<label>.<format>, with a .drx grade file next to each still
+    def ExportStills(self, stills, folder_path, file_prefix, export_format):
+        self._call("ExportStills")
+        for position, still in enumerate(stills):
+            label = self.labels.get(id(still)) or f"{position + 1}.1.1"
+            base = os.path.join(folder_path, f"{file_prefix}_{label}")
+            # Fast compression keeps the fake's own cost small next to the configured latency
+            still.render().save(f"{base}.{export_format}", compress_level=1)
+            with open(f"{base}.drx", "w") as drx_file:
+                drx_file.write("<grade/>")
+        return True
+
+# Class for the project gallery
+class FakeGallery(FakeResolveObject):
+    def __init__(self, session):
+        super().__init__(session)
+        self.album = FakeGalleryStillAlbum(session)
+
+    def GetCurrentStillAlbum(self):
+        self._call("GetCurrentStillAlbum")
+        return self.album
+
+# Class for a timeline with markers and video tracks
+class FakeTimeline(FakeResolveObject):
+    def __init__(self, session, gallery, name, fps, start_frame, end_frame, markers, tracks, still_size):
+        super().__init__(session)
+        self.gallery = gallery
+        self.name = name
+        self.fps = fps
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.markers = markers
+        # Video tracks, bottom to top; each is a list of FakeTimelineItem
+        self.tracks = tracks
+        self.still_size = still_size
+        self.playhead = start_frame
+
+    def _timecode(self, frame):
+        hours, rest = divmod(frame, self.fps * 3600)
+        minutes, rest = divmod(rest, self.fps * 60)
+        seconds, frames = divmod(rest, self.fps)
+        return f"{hours % 24:02d}:{minutes:02d}:{seconds:02d}:{frames:02d}"
+
+    def _frame(self, timecode):
+        hours, minutes, seconds, frames = (int(part) for part in timecode.replace(";", ":").split(":"))
+        return ((hours * 60 + minutes) * 60 + seconds) * self.fps + frames
+
+    def GetName(self):
+        self._call("GetName")
+        return self.name
+
+    def GetMarkers(self):
+        self._call("GetMarkers")
+        return {frame: dict(marker) for frame, marker in self.markers.items()}
+
+    def GetStartFrame(self):
+        self._call("GetStartFrame")
+        return self.start_frame
+
+    def GetEndFrame(self):
+        self._call("GetEndFrame")
+        return self.end_frame
+
+    def GetStartTimecode(self):
+        self._call("GetStartTimecode")
+        return self._timecode(self.start_frame)
+
+    def GetSetting(self, name):
+        self._call("GetSetting")
+        return {"timelineFrameRate": str(self.fps), "timelineDropFrameTimecode": "0"}.get(name, "")
+
+    def GetCurrentTimecode(self):
+        self._call("GetCurrentTimecode")
+        return self._timecode(self.playhead)
+
+    def SetCurrentTimecode(self, timecode):
+        self._call("SetCurrentTimecode")
+        try:
+            self.playhead = self._frame(timecode)
+        except ValueError:
+            return False
+        return True
+
+    def GetTrackCount(self, track_type):
+        self._call("GetTrackCount")
+        return len(self.tracks) if track_type == "video" else 0
+
+    def GetItemListInTrack(self, track_type, index):
+        self._call("GetItemListInTrack")
+        return list(self.tracks[index - 1]) if track_type == "video" else []
+
+    def GetIsTrackEnabled(self, track_type, index):
+        self._call("GetIsTrackEnabled")
+        return True
+
+    def _item_at(self, frame):
+        for track in reversed(self.tracks):
+            for item in track:
+                if item.start <= frame < item.end:
+                    return item
+        return None
+
+    def GetCurrentVideoItem(self):
+        self._call("GetCurrentVideoItem")
+        return self._item_at(self.playhead)
+
+    def GrabStill(self):
+        self._call("GrabStill")
+        still = FakeGalleryStill(self._item_at(self.playhead), self.playhead, self.still_size)
+        self.gallery.album.stills.append(still)
+        return still
+
+# Class for a project holding one or more timelines
+class FakeProject(FakeResolveObject):
+    def __init__(self, session, name):
+        super().__init__(session)
+        self.name = name
+        self.gallery = FakeGallery(session)
+        self.timelines = []
+        self.current_timeline = None
+
+    def GetName(self):
+        self._call("GetName")
+        return self.name
+
+    def GetGallery(self):
+        self._call("GetGallery")
+        return self.gallery
+
+    def GetCurrentTimeline(self):
+        self._call("GetCurrentTimeline")
+        return self.current_timeline
+
+    def SetCurrentTimeline(self, timeline):
+        self._call("SetCurrentTimeline")
+        self.current_timeline = timeline
+        return True
+
+    def GetTimelineCount(self):
+        self._call("GetTimelineCount")
+        return len(self.timelines)
+
+    def GetTimelineByIndex(self, index):
+        self._call("GetTimelineByIndex")
+        return self.timelines[index - 1]
+
+    # Add a synthetic timeline: markers every `spacing` frames, `markers_per_clip` markers per clip
+    def add_synthetic_timeline(self, name, marker_count, markers_per_clip=10, spacing=48, fps=24,
+                               start_frame=86400, still_size=(1920, 1080)):
+        clip_length = spacing * markers_per_clip
+        clip_count = max(1, -(-marker_count // markers_per_clip))
+        track = []
+        for clip_index in range(clip_count):
+            clip_name = f"{name}_A{clip_index + 1:03d}_C{clip_index + 1:03d}.mov"
+            properties = {
+                "Clip Name": clip_name,
+                "FPS": str(fps),
+                "File Path": f"/media/{self.name}/{name}/{clip_name}",
+                "Video Codec": "Apple ProRes 4444",
+                "Resolution": f"{still_size[0]}x{still_size[1]}",
+                "Start TC": "00:00:00:00",
+                "End TC": "00:00:20:00",
+                "Reel Name": f"A{clip_index + 1:03d}",
+            }
+            media_pool_item = FakeMediaPoolItem(self.session, f"{self.name}-{name}-{clip_index}", clip_name, properties)
+            start = start_frame + clip_index * clip_length
+            color = ((clip_index * 67) % 256, (clip_index * 131) % 256, (clip_index * 197) % 256)
+            track.append(FakeTimelineItem(self.session, clip_name, start, start + clip_length, media_pool_item, color))
+
+        markers = {}
+        for marker_index in range(marker_count):
+            frame = marker_index * spacing + spacing // 2
+            markers[frame] = {
+                "color": FAKE_MARKER_COLORS[marker_index % len(FAKE_MARKER_COLORS)],
+                "duration": 1,
+                "name": f"SH{marker_index + 1:04d}",
+                "note": f"Note for shot {marker_index + 1}",
+                "customData": "",
+            }
+
+        timeline = FakeTimeline(
+            self.session, self.gallery, name, fps, start_frame,
+            start_frame + clip_count * clip_length, markers, [track], still_size,
+        )
+        self.timelines.append(timeline)
+        if self.current_timeline is None:
+            self.current_timeline = timeline
+        return timeline
+
+# Class for the project manager
+class FakeProjectManager(FakeResolveObject):
+    def __init__(self, session):
+        super().__init__(session)
+        self.projects = []
+        self.current_project = None
+
+    def GetCurrentProject(self):
+        self._call("GetCurrentProject")
+        return self.current_project
+
+    def LoadProject(self, name):
+        self._call("LoadProject")
+        for project in self.projects:
+            if project.name == name:
+                self.current_project = project
+                return project
+        return None
+
+    def add_project(self, name):
+        project = FakeProject(self.session, name)
+        self.projects.append(project)
+        if self.current_project is None:
+            self.current_project = project
+        return project
+
+# Class standing in for the object returned by DaVinciResolveScript.scriptapp("Resolve")
+class FakeResolve(FakeResolveObject):
+    def __init__(self, latency=0.0):
+        super().__init__(FakeSession(latency))
+        self.project_manager = FakeProjectManager(self.session)
+        self.page = "edit"
+
+    @property
+    def calls(self):
+        return self.session.calls
+
+    def GetProjectManager(self):
+        self._call("GetProjectManager")
+        return self.project_manager
+
+    def OpenPage(self, page):
+        self._call("OpenPage")
+        self.page = page
+        return True
+
+# Function to build a fake Resolve with synthetic projects ("FakeProject", "FakeProject 2", ...)
+# each holding synthetic timelines ("Timeline 1", "Timeline 2", ...) of marker_count markers
+def create_fake_resolve(marker_count, latency=0.0, still_size=(1920, 1080), markers_per_clip=10,
+                        timeline_count=1, project_count=1):
+    resolve = FakeResolve(latency)
+    for project_index in range(project_count):
+        project = resolve.project_manager.add_project(
+            "FakeProject" if project_index == 0 else f"FakeProject {project_index + 1}"
+        )
+        for timeline_index in range(timeline_count):
+            project.add_synthetic_timeline(
+                f"Timeline {timeline_index + 1}", marker_count, markers_per_clip, still_size=still_size
+            )
+    return resolve
@@ -1,24 +1,418 @@
 # Natalia Raz
 # Shotlist Creator for DaVinci Resolve Studio
 
+import contextlib
+import dataclasses
+import hashlib
+import io
+import json
 import os
 import platform
+import queue
+import re
+import shutil
 import subprocess
+import sys
+import tempfile
+import threading
 import time
-import DaVinciResolveScript as dvr_script
-import xlsxwriter
-from PySide6 import QtWidgets, QtCore, QtGui
-from PIL import Image
-from pynput.keyboard import Controller
-
-# Connect to the currently running instance of Resolve
-resolve = dvr_script.scriptapp("Resolve")
-
-# Create an instance of the keyboard controller
-keyboard = Controller()
+from bisect import bisect_right
+from collections import ChainMap
+from types import MappingProxyType
+
+# Heavy dependencies (xlsxwriter, PIL, PySide6, pynput, DaVinciResolveScript,
+# concurrent.futures) are imported inside the functions that use them, so
+# starting the script only pays for what the chosen code path needs
+
+# Connection to the running instance of Resolve and the keyboard controller, created on first use
+_resolve = None
+_keyboard = None
+
+# Tracer recording stage timings and Resolve calls, or None when tracing is off
+_tracer = None
+
+# Function to connect to the currently running instance of Resolve
+def get_resolve():
+    global _resolve
+    if _resolve is None:
+        import DaVinciResolveScript as dvr_script
+        _resolve = dvr_script.scriptapp("Resolve")
+    return _resolve
+
+# Function to create the keyboard controller used by the legacy hotkey navigation
+def get_keyboard():
+    global _keyboard
+    if _keyboard is None:
+        from pynput.keyboard import Controller
+        _keyboard = Controller()
+    return _keyboard
+
+# Playhead seek settings (seconds): first poll delay, maximum poll delay and give-up timeout
+SEEK_POLL_START = 0.005
+SEEK_POLL_MAX = 0.1
+SEEK_TIMEOUT = 2.0
+
+# Resolve call guard: seconds a call may take (per method, with a default), retries of calls
+# that transiently returned None, first retry delay (doubled on every retry), calls in
+# flight at once (Resolve serves one at a time) and how often the UI is serviced while a
+# call is running
+RESOLVE_CALL_TIMEOUT = 60.0
+RESOLVE_CALL_TIMEOUTS = {"ExportStills": 600.0, "DeleteStills": 300.0, "LoadProject": 300.0}
+RESOLVE_CALL_RETRIES = 2
+RESOLVE_RETRY_DELAY = 0.05
+RESOLVE_MAX_IN_FLIGHT = 1
+RESOLVE_IDLE_INTERVAL = 0.05
+
+# Calls whose None result can be a hiccup of a busy Resolve rather than a real answer
+RESOLVE_RETRY_ON_NONE = {
+    "GetProjectManager", "GetCurrentProject", "GetCurrentTimeline", "GetGallery", "GetCurrentStillAlbum",
+    "GetCurrentVideoItem", "GrabStill",
+}
+
+# Delay used by the legacy keyboard "Next Marker" navigation
+KEYBOARD_SEEK_DELAY = 0.2
+
+# Maximum number of stills sent to Resolve in one ExportStills call
+EXPORT_CHUNK_SIZE = 100
+
+# Pipelined runs: stills exported per ExportStills call (small, so resizing starts early)
+# and marker rows allowed in flight between the Resolve stage and the sheet writer
+PIPELINE_EXPORT_CHUNK_SIZE = 16
+PIPELINE_QUEUE_SIZE = 64
+
+# Size cap of the shared thumbnail cache in bytes
+THUMBNAIL_CACHE_SIZE = 1024 * 1048576
+
+# Default JPEG quality of thumbnails, and the lowest one a size budget may step down to
+THUMBNAIL_QUALITY = 85
+JPEG_MIN_QUALITY = 30
+
+# Share of a workbook size budget given to the embedded images
+SIZE_BUDGET_IMAGE_SHARE = 0.95
+
+# Grid the perceptual hash of a still is computed on (width x height, one bit per adjacent
+# pair, so 9 x 8 gives a 64-bit hash)
+DEDUP_HASH_WIDTH = 9
+DEDUP_HASH_HEIGHT = 8
+
+# Hash bits two stills may differ in and still count as the same picture; kept below 8 so
+# that matching hashes always share one of their bytes (see StillMatcher)
+DEDUP_HASH_DISTANCE = 6
+
+# Mean color levels (0-255, per channel) two stills may differ by and still count as the same
+DEDUP_COLOR_TOLERANCE = 12
+
+# Rows per shard when a shotlist is split every N rows
+SHARD_ROWS = 500
+
+# Contact sheets written next to the workbook, instead of printing the workbook to PDF
+CONTACT_SHEET_FORMATS = ["pdf", "html", "mosaic"]
+
+# PDF contact sheet pages: A4 landscape at 150 dpi, margin and columns x rows of markers per page
+CONTACT_SHEET_PAGE_SIZE = (1754, 1240)
+CONTACT_SHEET_DPI = 150
+CONTACT_SHEET_MARGIN = 60
+CONTACT_SHEET_GRID = (4, 3)
+CONTACT_SHEET_FONT_SIZE = 16
+
+# Mosaic pages: columns x rows of tiles, each above a band holding the marker name and timecode
+MOSAIC_GRID = (8, 8)
+MOSAIC_LABEL_HEIGHT = 24
+MOSAIC_GAP = 4
+MOSAIC_BACKGROUND = (24, 24, 24)
+
+# Append-only progress journal kept in the output folder until a run finishes
+JOURNAL_FILENAME = ".shotlist_journal.jsonl"
+
+# Suffix of the manifest saved next to each workbook for incremental re-exports
+MANIFEST_SUFFIX = ".manifest.json"
+
+# Hidden sibling folders: the one an export is built in until it is published with a single
+# rename, and the ones replaced outputs are moved to while they are deleted in the background
+STAGING_SUFFIX = ".partial"
+REPLACED_SUFFIX = ".replaced"
+
+# Left in a staging folder whose finished export could not be published (e.g. while the old
+# workbook was open in Excel), so the next run publishes it instead of deleting it
+UNPUBLISHED_FILENAME = ".shotlist_unpublished"
+
+# Upper bounds (milliseconds) of the latency histogram buckets in traces
+TRACE_HISTOGRAM_BOUNDS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+# Span shared by every trace_span call while tracing is off
+_NO_SPAN = contextlib.nullcontext()
+
+# Class for recording timed spans (pipeline stages and Resolve calls) of one run,
+# saved as a Chrome trace (chrome://tracing, Perfetto) with per-name latency histograms
+class Tracer:
+    def __init__(self):
+        self.origin = time.perf_counter()
+        # Spans are recorded from the Resolve stage and the writer thread
+        self.lock = threading.Lock()
+        self.events = []
+        # (category, name) -> list of durations in seconds
+        self.durations = {}
+        self.thread_names = {}
+
+    def record(self, category, name, start, duration):
+        thread = threading.current_thread()
+        with self.lock:
+            self.events.append((category, name, start, duration, thread.ident))
+            self.durations.setdefault((category, name), []).append(duration)
+            self.thread_names.setdefault(thread.ident, thread.name)
+
+    @contextlib.contextmanager
+    def span(self, name, category="stage"):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(category, name, start, time.perf_counter() - start)
+
+    # Return a stand-in for a Resolve object that times every method call made through it
+    def wrap(self, resolve_object):
+        return ResolveObjectProxy(resolve_object, self.traced_call)
+
+    # Make one Resolve call for a stand-in, recording how long it took
+    def traced_call(self, name, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self.record("resolve", name, start, time.perf_counter() - start)
+
+    def histogram(self, durations):
+        counts = [0] * (len(TRACE_HISTOGRAM_BOUNDS) + 1)
+        for duration in durations:
+            counts[bisect_right(TRACE_HISTOGRAM_BOUNDS, duration * 1000)] += 1
+        return counts
+
+    def summary(self):
+        lines = [f"{'Span':<32}{'Count':>8}{'Total ms':>12}{'Mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'Max ms':>10}"]
+        for (category, name), durations in sorted(
+            self.durations.items(), key=lambda item: (item[0][0] != "stage", -sum(item[1]))
+        ):
+            ordered = sorted(durations)
+            count = len(ordered)
+            lines.append(
+                f"{category + ':' + name:<32}{count:>8}{sum(ordered) * 1000:>12.1f}"
+                f"{sum(ordered) * 1000 / count:>10.2f}{ordered[count // 2] * 1000:>10.2f}"
+                f"{ordered[min(count - 1, int(count * 0.95))] * 1000:>10.2f}{ordered[-1] * 1000:>10.2f}"
+            )
+        return "\n".join(lines)
+
+    # Write the spans as complete ("X") trace events, plus counts and histograms
+    def save(self, trace_path):
+        pid = os.getpid()
+        trace_events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in self.thread_names.items()
+        ]
+        for category, name, start, duration, tid in self.events:
+            trace_events.append({
+                "name": name, "cat": category, "ph": "X", "pid": pid, "tid": tid,
+                "ts": round((start - self.origin) * 1e6, 1), "dur": round(duration * 1e6, 1),
+            })
+        spans = {
+            f"{category}:{name}": {
+                "count": len(durations),
+                "total_ms": sum(durations) * 1000,
+                "histogram_ms": dict(zip([str(bound) for bound in TRACE_HISTOGRAM_BOUNDS] + ["inf"], self.histogram(durations))),
+            }
+            for (category, name), durations in self.durations.items()
+        }
+        with open(trace_path, "w", encoding="utf-8") as trace_file:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms", "otherData": {"spans": spans}}, trace_file)
+
+# Class standing in for a Resolve scripting object: every method call is made through
+# call(name, method, *args) and the objects it returns (timelines, items, stills) are
+# wrapped in turn. Tracing and the call guard are both built on it
+class ResolveObjectProxy:
+    def __init__(self, target, call):
+        self._target = target
+        self._call = call
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+        call = self._call
+
+        def proxied_call(*args):
+            return wrap_proxied(call(name, attribute, *[unwrap_proxied(arg) for arg in args]), call)
+        return proxied_call
+
+    # Equal to the object it wraps, so stills and items can be compared and looked up as before
+    def __eq__(self, other):
+        return self._target == unwrap_proxied(other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+# Function to wrap the Resolve objects in a call result (plain values are returned as they are)
+def wrap_proxied(value, call):
+    if value is None or isinstance(value, (str, bytes, int, float, bool, dict)):
+        return value
+    if isinstance(value, list):
+        return [wrap_proxied(element, call) for element in value]
+    return ResolveObjectProxy(value, call)
+
+# Function to hand Resolve the objects behind stand-ins (one layer, so proxies can be stacked)
+def unwrap_proxied(value):
+    if isinstance(value, ResolveObjectProxy):
+        return value._target
+    if isinstance(value, list):
+        return [unwrap_proxied(element) for element in value]
+    return value
+
+# Function to turn tracing on for the rest of the process, returning the tracer
+def start_tracing():
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+# Function to turn tracing off, print the summary table and save the trace
+def stop_tracing(trace_path=None):
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is None:
+        return
+    print(tracer.summary())
+    if trace_path:
+        tracer.save(trace_path)
+        print(f"Trace saved to {trace_path}")
+
+# Function to time a pipeline stage; costs a single check while tracing is off
+def trace_span(name):
+    if _tracer is None:
+        return _NO_SPAN
+    return _tracer.span(name)
+
+# Class running Resolve calls on dedicated daemon threads, so a call that never returns
+# can't keep the process from exiting (unlike the workers of a ThreadPoolExecutor)
+class ResolveCallThreads:
+    def __init__(self, workers=RESOLVE_MAX_IN_FLIGHT):
+        self.calls = queue.Queue()
+        self.threads = [
+            threading.Thread(target=self._run, name=f"resolve-call-{number + 1}", daemon=True)
+            for number in range(workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def _run(self):
+        while True:
+            call = self.calls.get()
+            if call is None:
+                return
+            future, function, args = call
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = function(*args)
+            except BaseException as error:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    # Queue a call, returning a concurrent.futures.Future of its result
+    def submit(self, function, *args):
+        from concurrent.futures import Future
+
+        future = Future()
+        self.calls.put((future, function, args))
+        return future
+
+    def shutdown(self):
+        for _ in self.threads:
+            self.calls.put(None)
+
+# Class guarding every call into Resolve: calls run on a dedicated thread with a timeout,
+# calls that returned None transiently are retried with backoff, and only max_in_flight
+# calls run at once. A call that timed out keeps its slot until Resolve actually returns
+# from it, and is not retried, since a retry could only queue behind it. Coroutines await call();
+# the rest of the script goes through wrap(), whose stand-ins wait for each call while
+# the event loop runs on a thread of its own, calling idle (e.g. to keep a Qt UI responsive)
+class ResolveCallGuard:
+    def __init__(self, timeout=RESOLVE_CALL_TIMEOUT, retries=RESOLVE_CALL_RETRIES,
+                 max_in_flight=RESOLVE_MAX_IN_FLIGHT, idle=None):
+        import asyncio
+
+        self.timeout = timeout
+        self.retries = retries
+        self.max_in_flight = max_in_flight
+        self.idle = idle
+        self.call_threads = ResolveCallThreads(max_in_flight)
+        # Created on the event loop by the first call
+        self.semaphore = None
+        self.retried = 0
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self.loop.run_forever, name="resolve-calls", daemon=True)
+        self.loop_thread.start()
+
+    def call_timeout(self, name):
+        return max(self.timeout, RESOLVE_CALL_TIMEOUTS.get(name, 0))
+
+    # Call function (the Resolve method called name) and return its result
+    async def call(self, name, function, *args):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_in_flight)
+        timeout = self.call_timeout(name)
+        delay = RESOLVE_RETRY_DELAY
+        for attempt in range(self.retries + 1):
+            deadline = loop.time() + timeout
+            # Waiting for a call that timed out earlier counts toward this call's timeout
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Resolve was still busy with an earlier call; {name} was not made") from None
+            future = self.call_threads.submit(function, *args)
+            # The slot is freed once Resolve returns, even from a call given up on
+            future.add_done_callback(lambda _: loop.call_soon_threadsafe(self.semaphore.release))
+            try:
+                result = await asyncio.wait_for(asyncio.wrap_future(future), max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Resolve did not answer {name} within {timeout:g} seconds") from None
+            if result is not None or name not in RESOLVE_RETRY_ON_NONE or attempt == self.retries:
+                return result
+            self.retried += 1
+            await asyncio.sleep(delay)
+            delay *= 2
+
+    # Make a call from outside the event loop, waiting for its result
+    def call_sync(self, name, function, *args):
+        import asyncio
+        from concurrent.futures import wait
+
+        if not self.loop_thread.is_alive():
+            raise RuntimeError(f"Resolve call {name} made after the call guard was closed")
+        future = asyncio.run_coroutine_threadsafe(self.call(name, function, *args), self.loop)
+        if self.idle is not None:
+            while not wait([future], RESOLVE_IDLE_INTERVAL).done:
+                self.idle()
+        return future.result()
+
+    # Return a stand-in for a Resolve object whose method calls all go through the guard
+    def wrap(self, resolve_object):
+        return ResolveObjectProxy(resolve_object, self.call_sync)
+
+    def summary(self):
+        return f"Resolve calls: {self.retried} retried."
+
+    # Stop the event loop; a call that is still stuck is left to its daemon thread
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join()
+        self.call_threads.shutdown()
+        if self.retried:
+            print(self.summary())
 
 # Function to get the save file name from the user
 def get_save_file_name(project_name):
+    from PySide6 import QtWidgets
     app = QtWidgets.QApplication.instance()
     if not app:
         app = QtWidgets.QApplication([])
@@ -35,6 +429,7 @@ def get_save_file_name(project_name):
 
 # Function to handle folder/file replacement or renaming
 def ask_replace_or_rename(file_or_folder):
+    from PySide6 import QtWidgets
     msgBox = QtWidgets.QMessageBox()
     msgBox.setIcon(QtWidgets.QMessageBox.Question)
     msgBox.setText(f"'{file_or_folder}' already exists. What would you like to do?")
@@ -53,23 +448,42 @@ def ask_replace_or_rename(file_or_folder):
     else:
         return "cancel"
 
-# Function to create a subfolder, handling conflicts with existing folders
-def ask_create_subfolder(output_path, file_name):
+# Function to find a free name next to an existing file or folder (name_1, name_2, ...)
+def next_free_name(directory, name):
+    stem, extension = os.path.splitext(name)
+    counter = 1
+    while os.path.exists(os.path.join(directory, f"{stem}_{counter}{extension}")):
+        counter += 1
+    return f"{stem}_{counter}{extension}"
+
+# Function to ask whether an unfinished export found in a folder should be resumed
+def ask_resume(folder_name):
+    from PySide6 import QtWidgets
+    answer = QtWidgets.QMessageBox.question(
+        None,
+        "Resume Export",
+        f"'{folder_name}' holds an unfinished export. Resume it and skip the markers already done?",
+    )
+    return answer == QtWidgets.QMessageBox.Yes
+
+# Function to choose the output subfolder once, up front, handling conflicts with an existing
+# folder: "replace" keeps its path (the folder is only swapped out when the new export is
+# published), "rename" picks another name. conflict_policy is "ask" (dialogs) or a fixed
+# "replace", "rename" or "cancel"; returns (subfolder_path, file_name), or (None, None)
+def choose_output_folder(output_path, file_name, conflict_policy="ask"):
     subfolder_name = os.path.splitext(file_name)[0]
     subfolder_path = os.path.join(output_path, subfolder_name)
 
-    while True:
-        if os.path.exists(subfolder_path):
+    while os.path.exists(subfolder_path):
+        if conflict_policy == "ask":
             action = ask_replace_or_rename(subfolder_name)
-            if action == "replace":
-                # Delete the existing folder if replacing
-                for root, dirs, files in os.walk(subfolder_path, topdown=False):
-                    for file in files:
-                        os.remove(os.path.join(root, file))
-                    for dir in dirs:
-                        os.rmdir(os.path.join(root, dir))
-                break
-            elif action == "rename":
+        else:
+            action = conflict_policy
+        if action == "replace":
+            break
+        elif action == "rename":
+            if conflict_policy == "ask":
+                from PySide6 import QtWidgets
                 app = QtWidgets.QApplication.instance()
                 if not app:
                     app = QtWidgets.QApplication([])
@@ -79,44 +493,162 @@ def ask_create_subfolder(output_path, file_name):
                     "Enter new name for the folder and file:",
                     text=subfolder_name,
                 )
-                if ok and new_name:
-                    subfolder_path = os.path.join(output_path, new_name)
-                    file_name = f"{new_name}.xlsx"
-                    subfolder_name = new_name  # Update subfolder_name for accurate display
-                else:
-                    return None, None  # Cancel operation
+            else:
+                new_name, ok = next_free_name(output_path, subfolder_name), True
+            if ok and new_name:
+                subfolder_path = os.path.join(output_path, new_name)
+                file_name = f"{new_name}.xlsx"
+                subfolder_name = new_name  # Update subfolder_name for accurate display
             else:
                 return None, None  # Cancel operation
         else:
-            os.makedirs(subfolder_path)
-            break
+            return None, None  # Cancel operation
 
     return subfolder_path, file_name
 
-# Function to get the appropriate color format for Excel cells
-def get_color_format(workbook, color_name):
-    color_map = {
-        "Rose": "#FF007F",
-        "Pink": "#FFC0CB",
-        "Lavender": "#E6E6FA",
-        "Cyan": "#00FFFF",
-        "Fuchsia": "#FF00FF",
-        "Mint": "#98FF98",
-        "Sand": "#C2B280",
-        "Yellow": "#FFFF00",
-        "Green": "#00FF00",
-        "Blue": "#0000FF",
-        "Purple": "#800080",
-        "Red": "#FF0000",
-        "Cocoa": "#D2691E",
-        "Sky": "#87CEEB",
-        "Lemon": "#FFF44F",
-        "Cream": "#FFFDD0",
-    }
-    hex_color = color_map.get(color_name, "#FFFFFF")  # Default to white if color is not found
-    return workbook.add_format(
-        {"bg_color": hex_color, "valign": "vcenter", "align": "center"}
+# Function to find the hidden folder an export to folder_path is built in
+def get_staging_path(folder_path):
+    parent_path, name = os.path.split(folder_path)
+    return os.path.join(parent_path, f".{name}{STAGING_SUFFIX}")
+
+# Function to move a folder out of the way with one rename (it stays on the same filesystem),
+# into a new hidden folder next to it; returns that hidden folder
+def move_aside(folder_path):
+    parent_path, name = os.path.split(folder_path)
+    replaced_path = tempfile.mkdtemp(prefix=f".{name.lstrip('.')}{REPLACED_SUFFIX}-", dir=parent_path)
+    try:
+        os.rename(folder_path, os.path.join(replaced_path, name))
+    except OSError:
+        os.rmdir(replaced_path)
+        raise
+    return replaced_path
+
+# Function to delete a folder on a background thread
+def delete_in_background(folder_path):
+    thread = threading.Thread(
+        target=shutil.rmtree, args=(folder_path,), kwargs={"ignore_errors": True}, name="shotlist-cleanup"
     )
+    thread.start()
+    return thread
+
+# Function to delete a folder without waiting for it: it is moved aside at once and deleted
+# by a background thread
+def remove_in_background(folder_path):
+    return delete_in_background(move_aside(folder_path))
+
+# Output of one run: the folder the export is written into and, for new exports, the folder
+# it is published to once it is complete
+@dataclasses.dataclass
+class OutputFolder:
+    path: str
+    excel_filename: str
+    # True when an unfinished or earlier export is continued in path
+    resumed: bool = False
+    # Where the finished export goes (None when path is already in place)
+    publish_path: str = None
+
+    # Move the finished export into place with one rename; an output it replaces is moved
+    # aside first and deleted in the background. Returns the published folder, or None when
+    # it can't be moved, in which case the export stays in its staging folder for the next run
+    def publish(self):
+        if self.publish_path is None:
+            return self.path
+        replaced_path = None
+        try:
+            if os.path.exists(self.publish_path):
+                replaced_path = move_aside(self.publish_path)
+            try:
+                os.rename(self.path, self.publish_path)
+            except OSError:
+                # Put the old output back where it was
+                if replaced_path is not None:
+                    os.rename(os.path.join(replaced_path, os.path.basename(self.publish_path)), self.publish_path)
+                    os.rmdir(replaced_path)
+                raise
+        except OSError as error:
+            with open(os.path.join(self.path, UNPUBLISHED_FILENAME), "w", encoding="utf-8") as marker_file:
+                marker_file.write(self.publish_path)
+            print(
+                f"Could not move the export to {self.publish_path} ({error}). It is complete in {self.path}; "
+                "close any files open in the old folder and run the export again to publish it."
+            )
+            return None
+        if replaced_path is not None:
+            delete_in_background(replaced_path)
+        unpublished_path = os.path.join(self.publish_path, UNPUBLISHED_FILENAME)
+        if os.path.exists(unpublished_path):
+            os.remove(unpublished_path)
+        self.path, self.publish_path = self.publish_path, None
+        return self.path
+
+# Marker colors and the fill used for them in the Color column
+MARKER_COLORS = {
+    "Rose": "#FF007F",
+    "Pink": "#FFC0CB",
+    "Lavender": "#E6E6FA",
+    "Cyan": "#00FFFF",
+    "Fuchsia": "#FF00FF",
+    "Mint": "#98FF98",
+    "Sand": "#C2B280",
+    "Yellow": "#FFFF00",
+    "Green": "#00FF00",
+    "Blue": "#0000FF",
+    "Purple": "#800080",
+    "Red": "#FF0000",
+    "Cocoa": "#D2691E",
+    "Sky": "#87CEEB",
+    "Lemon": "#FFF44F",
+    "Cream": "#FFFDD0",
+}
+
+# Class holding the cell formats of one workbook, created once and shared by every cell
+class WorkbookStyles:
+    def __init__(self, workbook):
+        # Set up cell formats for text
+        self.text = workbook.add_format({"valign": "vcenter", "align": "left"})
+        self.colors = {
+            color_name: workbook.add_format({"bg_color": hex_color, "valign": "vcenter", "align": "center"})
+            for color_name, hex_color in MARKER_COLORS.items()
+        }
+        # Default to white if color is not found
+        self.default_color = workbook.add_format({"bg_color": "#FFFFFF", "valign": "vcenter", "align": "center"})
+
+    # Return the format for a marker color cell
+    def color(self, color_name):
+        return self.colors.get(color_name, self.default_color)
+
+# Column widths in characters: padding added to the widest value, default cap,
+# and caps for fields that can hold long text (None means uncapped)
+COLUMN_WIDTH_PADDING = 2
+COLUMN_WIDTH_CAP = 80
+COLUMN_WIDTH_CAPS = {"Note": 60, "File Path": 60, "Still": None}
+
+# Class tracking the widest value written to each column, so widths are set once at the end
+class ColumnWidthTracker:
+    def __init__(self, headers):
+        self.caps = [COLUMN_WIDTH_CAPS.get(header, COLUMN_WIDTH_CAP) for header in headers]
+        self.widths = [len(str(header)) for header in headers]
+
+    # Record a cell value written to a column
+    def record(self, col, value):
+        text = str(value) if value is not None else ""
+        # Multi-line cells are as wide as their longest line
+        width = max(len(line) for line in text.split("\n"))
+        if width > self.widths[col]:
+            self.widths[col] = width
+
+    # Record an exact width (e.g. of an embedded image) for a column
+    def record_width(self, col, width):
+        if width > self.widths[col]:
+            self.widths[col] = width
+
+    # Apply all column widths in one pass
+    def apply(self, worksheet):
+        for col, (width, cap) in enumerate(zip(self.widths, self.caps)):
+            width += COLUMN_WIDTH_PADDING
+            if cap is not None:
+                width = min(width, cap)
+            worksheet.set_column(col, col, width)
 
 # Function to open the output folder in Explorer (Windows) or Finder (macOS)
 def open_folder_in_explorer(output_path):
@@ -129,6 +661,7 @@ def open_folder_in_explorer(output_path):
 
 # Function to focus back on the timeline (edit page) before keyboard presses
 def focus_on_timeline():
+    from PySide6 import QtWidgets
     app = QtWidgets.QApplication.instance()
     if not app:
         app = QtWidgets.QApplication([])
@@ -141,148 +674,1442 @@ def focus_on_timeline():
         resolve_window_name = "DaVinci Resolve"  # Replace with the actual window name if necessary
         subprocess.run(f'cmdow "{resolve_window_name}" /ACT', shell=True)
 
-# Function to export markers and create an Excel file
-def export_markers(timeline, output_path, timecodes, excel_filename, metadata_list, selected_fields, image_size):
-    markers = timeline.GetMarkers()
-    workbook = xlsxwriter.Workbook(os.path.join(output_path, excel_filename))
-    worksheet = workbook.add_worksheet()
-
-    # Set up cell formats for text
-    text_format = workbook.add_format({"valign": "vcenter", "align": "left"})
-
-    # Set image size based on user selection
-    max_size = image_size
+# Timecode rates supported by Resolve timelines: nominal frames per second and
+# frame numbers dropped at the start of each minute (except every tenth minute)
+TIMECODE_RATES = {
+    "23.976": (24, 0),
+    "24": (24, 0),
+    "25": (25, 0),
+    "29.97": (30, 0),
+    "29.97DF": (30, 2),
+    "30": (30, 0),
+    "50": (50, 0),
+    "59.94": (60, 0),
+    "59.94DF": (60, 4),
+    "60": (60, 0),
+}
+
+# Function to look up the nominal rate and dropped frame count for a frame rate
+def timecode_rate(fps, drop_frame=False):
+    key = str(fps).replace(" ", "").upper()
+    if key.endswith("DF"):
+        key, drop_frame = key[:-2], True
+    key = f"{float(key):g}"
+    if drop_frame and f"{key}DF" in TIMECODE_RATES:
+        return TIMECODE_RATES[f"{key}DF"]
+    if key in TIMECODE_RATES:
+        return TIMECODE_RATES[key]
+    return int(round(float(key))), 0
+
+# Function to read the timeline frame rate and drop-frame flag
+def get_timeline_rate(timeline):
+    rate = str(timeline.GetSetting("timelineFrameRate") or "24").split()[0]
+    fps = float(rate)
+    drop_frame = str(timeline.GetSetting("timelineDropFrameTimecode")) == "1"
+    return fps, drop_frame
+
+# Function to convert a batch of frame numbers to SMPTE timecode strings
+def frames_to_timecodes(frames, fps, drop_frame=False, start_frame=0):
+    nominal, dropped = timecode_rate(fps, drop_frame)
+    frames_per_minute = nominal * 60
+    frames_per_hour = nominal * 3600
+    separator = ";" if dropped else ":"
+    if dropped:
+        dropped_per_minute = frames_per_minute - dropped
+        dropped_per_10_minutes = dropped_per_minute * 10 + dropped
+
+    timecodes = []
+    append = timecodes.append
+    for frame in frames:
+        # Marker keys may come back as floats
+        frame = int(round(frame)) + start_frame
+        if dropped:
+            tens, rest = divmod(frame, dropped_per_10_minutes)
+            frame += dropped * 9 * tens
+            if rest > dropped:
+                frame += dropped * ((rest - dropped) // dropped_per_minute)
+        hours, rest = divmod(frame, frames_per_hour)
+        minutes, rest = divmod(rest, frames_per_minute)
+        seconds, rest = divmod(rest, nominal)
+        append(f"{hours % 24:02d}:{minutes:02d}:{seconds:02d}{separator}{rest:02d}")
+    return timecodes
+
+# Function to convert a batch of SMPTE timecode strings back to frame numbers
+def timecodes_to_frames(timecodes, fps, drop_frame=False, start_frame=0):
+    nominal, dropped = timecode_rate(fps, drop_frame)
+    frames = []
+    append = frames.append
+    for timecode in timecodes:
+        hours, minutes, seconds, rest = (int(part) for part in timecode.replace(";", ":").split(":"))
+        frame = ((hours * 60 + minutes) * 60 + seconds) * nominal + rest
+        if dropped:
+            total_minutes = hours * 60 + minutes
+            frame -= dropped * (total_minutes - total_minutes // 10)
+        append(frame - start_frame)
+    return frames
+
+# Function to compare timecodes regardless of the drop-frame separator
+def same_timecode(first, second):
+    if not first or not second:
+        return False
+    return first.replace(";", ":") == second.replace(";", ":")
+
+# Class for choosing which markers are exported, applied to the marker dict before any
+# playhead or still work. Every set criterion must match; unset (None) criteria match all.
+# ranges are [start, end] pairs (inclusive) of timecodes or marker frames, or "start-end" strings
+@dataclasses.dataclass
+class MarkerFilter:
+    colors: list = None
+    # Regular expressions searched in the marker name and note (case-insensitive)
+    name: str = None
+    note: str = None
+    ranges: list = None
+    min_duration: int = None
+    max_duration: int = None
+    # True keeps only markers with custom data, False only markers without
+    custom_data: bool = None
+
+    # Build a filter from a dict (e.g. a JSON filter file), rejecting unknown keys
+    @classmethod
+    def from_dict(cls, data):
+        known = {field.name for field in dataclasses.fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"Unknown marker filter keys: {', '.join(sorted(unknown))}")
+        marker_filter = cls(**data)
+        marker_filter.validate()
+        return marker_filter
+
+    # Load a filter from a JSON file
+    @classmethod
+    def load(cls, filter_path):
+        with open(filter_path, encoding="utf-8") as filter_file:
+            return cls.from_dict(json.load(filter_file))
+
+    def is_empty(self):
+        return all(getattr(self, field.name) in (None, [], "") for field in dataclasses.fields(self))
+
+    def validate(self):
+        for pattern in (self.name, self.note):
+            if pattern:
+                re.compile(pattern)
+        for marker_range in self.ranges or []:
+            parse_marker_range(marker_range)
+
+    # Return the markers that match, in their original order
+    def apply(self, markers, fps, drop_frame=False, start_frame=0):
+        colors = {color.lower() for color in self.colors} if self.colors else None
+        name_pattern = re.compile(self.name, re.IGNORECASE) if self.name else None
+        note_pattern = re.compile(self.note, re.IGNORECASE) if self.note else None
+        ranges = [
+            range_frames(parse_marker_range(marker_range), fps, drop_frame, start_frame)
+            for marker_range in self.ranges or []
+        ]
 
-    # Prepare headers
-    headers = selected_fields + ["Still"]
+        filtered = {}
+        for frame, marker in markers.items():
+            if colors is not None and str(marker.get("color", "")).lower() not in colors:
+                continue
+            if name_pattern and not name_pattern.search(marker.get("name") or ""):
+                continue
+            if note_pattern and not note_pattern.search(marker.get("note") or ""):
+                continue
+            if ranges and not any(first <= frame <= last for first, last in ranges):
+                continue
+            duration = marker.get("duration") or 0
+            if self.min_duration is not None and duration < self.min_duration:
+                continue
+            if self.max_duration is not None and duration > self.max_duration:
+                continue
+            if self.custom_data is not None and bool(marker.get("customData")) != self.custom_data:
+                continue
+            filtered[frame] = marker
+        return filtered
+
+# Function to split a marker range ("start-end" or [start, end]) into its two ends
+def parse_marker_range(marker_range):
+    if isinstance(marker_range, str):
+        # Timecodes contain no "-", so the first one separates the ends
+        parts = [part.strip() for part in marker_range.split("-", 1)]
+    else:
+        parts = list(marker_range)
+    if len(parts) != 2 or not all(
+        isinstance(part, int) or re.fullmatch(r"\d+|\d{1,2}[:;]\d{2}[:;]\d{2}[:;]\d{2}", str(part)) for part in parts
+    ):
+        raise ValueError(f"Invalid marker range {marker_range!r}; use START-END with timecodes or frames")
+    return parts
+
+# Function to turn the ends of a range into marker frames (offsets from the timeline start)
+def range_frames(parts, fps, drop_frame=False, start_frame=0):
+    frames = []
+    for part in parts:
+        if isinstance(part, int) or str(part).isdigit():
+            frames.append(int(part))
+        else:
+            frames.extend(timecodes_to_frames([part], fps, drop_frame, start_frame))
+    return min(frames), max(frames)
 
-    # Write header row
-    for col_num, header in enumerate(headers):
-        worksheet.write(0, col_num, header, text_format)
+# Function to get the timeline's markers, narrowed down by a MarkerFilter when one is set
+def get_markers(timeline, marker_filter=None):
+    markers = timeline.GetMarkers()
+    if marker_filter is None or marker_filter.is_empty():
+        return markers
+    fps, drop_frame = get_timeline_rate(timeline)
+    filtered = marker_filter.apply(markers, fps, drop_frame, timeline.GetStartFrame())
+    print(f"Marker filter: {len(filtered)} of {len(markers)} markers match.")
+    return filtered
+
+# Function to move the playhead to a timecode and wait until Resolve reports it
+def seek_to_timecode(timeline, timecode):
+    if not timeline.SetCurrentTimecode(timecode):
+        return False
+    delay = SEEK_POLL_START
+    deadline = time.monotonic() + SEEK_TIMEOUT
+    while True:
+        if same_timecode(timeline.GetCurrentTimecode(), timecode):
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        # Back off so fast seeks cost a few milliseconds and slow ones don't flood Resolve
+        time.sleep(delay)
+        delay = min(delay * 2, SEEK_POLL_MAX)
+
+# Function to move the playhead with the "Next Marker" hotkey (legacy navigation)
+def seek_with_keyboard(timeline):
+    keyboard = get_keyboard()
+    keyboard.press("0")
+    keyboard.release("0")
+    # Wait for the playhead to move to the next marker
+    time.sleep(KEYBOARD_SEEK_DELAY)
+    return timeline.GetCurrentTimecode()
+
+# Class for caching GetClipProperty results per media pool item for one run
+class ClipPropertyCache:
+    def __init__(self):
+        self.properties = {}
+        self.hits = 0
+        self.misses = 0
+
+    # Return the read-only property mapping for a media pool item, fetching it once
+    def get(self, media_pool_item):
+        key = media_pool_item.GetUniqueId()
+        properties = self.properties.get(key)
+        if properties is None:
+            self.misses += 1
+            properties = MappingProxyType(dict(media_pool_item.GetClipProperty() or {}))
+            self.properties[key] = properties
+        else:
+            self.hits += 1
+        return properties
+
+    def summary(self):
+        return f"Clip property cache: {self.hits} hits, {self.misses} misses"
+
+# Function to extract the metadata row for a timeline item (or "N/A" when there is none)
+def get_clip_metadata(timeline_item, property_cache=None):
+    if not timeline_item:
+        # If there is no clip, set all metadata to "N/A"
+        return {"Clip Name": "N/A"}
+    clip_metadata = {"Clip Name": timeline_item.GetName()}
+    media_pool_item = timeline_item.GetMediaPoolItem()
+    if media_pool_item:
+        if property_cache is None:
+            clip_properties = media_pool_item.GetClipProperty()
+        else:
+            clip_properties = property_cache.get(media_pool_item)
+        # Clip properties take precedence; rows on the same clip share one mapping
+        return ChainMap(clip_properties, clip_metadata)
+    return clip_metadata
+
+# Class for resolving timeline frames to the top-most video clip without moving the playhead
+class TimelineItemIndex:
+    def __init__(self, timeline, property_cache=None):
+        self.property_cache = property_cache
+        # One (starts, spans) pair per enabled video track, top-most track first
+        self.tracks = []
+        for track_index in range(timeline.GetTrackCount("video"), 0, -1):
+            if not timeline.GetIsTrackEnabled("video", track_index):
+                continue
+            items = timeline.GetItemListInTrack("video", track_index) or []
+            spans = sorted(
+                ((item.GetStart(), item.GetEnd(), item) for item in items),
+                key=lambda span: span[0],
+            )
+            if spans:
+                self.tracks.append(([span[0] for span in spans], spans))
+
+    # Return the top-most item covering an absolute timeline frame, or None
+    def item_at(self, frame):
+        for starts, spans in self.tracks:
+            position = bisect_right(starts, frame) - 1
+            if position >= 0:
+                start, end, item = spans[position]
+                if frame < end:
+                    return item
+        return None
+
+    # Return the clip_metadata dict for an absolute timeline frame
+    def clip_metadata(self, frame):
+        return get_clip_metadata(self.item_at(frame), self.property_cache)
+
+# Class describing how thumbnails are encoded before they are embedded: "png", "png8"
+# (palette PNG) or "jpeg" at a quality, with an optional cap on the bytes per thumbnail
+@dataclasses.dataclass(frozen=True)
+class ThumbnailEncoding:
+    format: str = "png"
+    quality: int = THUMBNAIL_QUALITY
+    max_bytes: int = None
+
+    # Short label used in thumbnail cache keys
+    def label(self):
+        return f"{self.format}:{self.quality}:{self.max_bytes or 0}"
+
+# Function to encode one thumbnail image in a format ("png", "png8" or "jpeg")
+def encode_image(image, image_format, quality=THUMBNAIL_QUALITY):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    if image_format == "jpeg":
+        image.convert("RGB").save(buffer, "JPEG", quality=quality)
+    elif image_format == "png8":
+        # Fast octree quantization to an adaptive 256-color palette
+        image.convert("RGB").quantize(256, method=Image.Quantize.FASTOCTREE).save(buffer, "PNG")
+    else:
+        image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+# Function to encode a thumbnail per encoding, stepping down to palette PNG and then to
+# lower JPEG qualities until it fits in encoding.max_bytes (the smallest try is kept)
+def encode_thumbnail(image, encoding):
+    image_data = encode_image(image, encoding.format, encoding.quality)
+    if not encoding.max_bytes or len(image_data) <= encoding.max_bytes:
+        return image_data
+
+    smallest = image_data
+    if encoding.format == "png":
+        smallest = min(smallest, encode_image(image, "png8"), key=len)
+        if len(smallest) <= encoding.max_bytes:
+            return smallest
+
+    # Binary search for the best JPEG quality that fits
+    low, high = JPEG_MIN_QUALITY, encoding.quality if encoding.format == "jpeg" else THUMBNAIL_QUALITY
+    if encoding.format == "jpeg":
+        high -= 1
+    best = None
+    while low <= high:
+        quality = (low + high) // 2
+        image_data = encode_image(image, "jpeg", quality)
+        if len(image_data) <= encoding.max_bytes:
+            best = image_data
+            low = quality + 1
+        else:
+            smallest = min(smallest, image_data, key=len)
+            high = quality - 1
+    return best or smallest
+
+# Function to make sure thumbnail bytes are PNG (cached thumbnails may be JPEG)
+def thumbnail_as_png(image_data):
+    from PIL import Image
+
+    if image_data.startswith(b"\x89PNG"):
+        return image_data
+    with Image.open(io.BytesIO(image_data)) as image:
+        return encode_image(image, "png")
+
+# Function to decode and downsample a still, returning the encoded thumbnail and its size
+def make_thumbnail(image_file_path, max_size, encoding=None):
+    from PIL import Image
+
+    with Image.open(image_file_path) as image:
+        width, height = image.size
+
+        # Calculate the new size (maintaining aspect ratio)
+        if width > height:
+            new_width = int(max_size)
+            new_height = int((max_size / width) * height)
+        else:
+            new_height = int(max_size)
+            new_width = int((max_size / height) * width)
+
+        # Let draft-capable decoders (JPEG) skip detail that would be thrown away
+        image.draft("RGB", (new_width, new_height))
+
+        # reducing_gap shrinks by an integer factor first (Image.reduce), then resamples
+        resized_image = image.resize((new_width, new_height), Image.BICUBIC, reducing_gap=2.0)
+
+    return encode_thumbnail(resized_image, encoding or ThumbnailEncoding()), new_width, new_height
+
+# Function to create the pool thumbnails are made in: worker processes when this
+# interpreter can spawn them, threads otherwise
+def create_thumbnail_executor(workers=None):
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    # Inside Resolve sys.executable is Resolve itself, so worker processes can't be spawned there
+    if os.path.basename(sys.executable).lower().startswith("python"):
+        try:
+            return ProcessPoolExecutor(max_workers=workers)
+        except (OSError, NotImplementedError) as error:
+            print(f"Process pool unavailable ({error}), resizing on threads.")
+
+    # Pillow releases the GIL while decoding and resampling, so threads still overlap
+    return ThreadPoolExecutor(max_workers=workers)
+
+# Function to wait for a thumbnail job, redoing it here if the worker pool died
+def thumbnail_result(future, image_file_path, max_size, encoding=None):
+    from concurrent.futures.process import BrokenProcessPool
+
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        return make_thumbnail(image_file_path, max_size, encoding)
+
+# Function to build thumbnails for many stills in parallel, preserving their order
+def make_thumbnails(image_file_paths, max_size, workers=None, encoding=None):
+    if workers == 1 or len(image_file_paths) < 2:
+        return [make_thumbnail(path, max_size, encoding) for path in image_file_paths]
+
+    with create_thumbnail_executor(workers) as pool:
+        futures = [pool.submit(make_thumbnail, path, max_size, encoding) for path in image_file_paths]
+        return [
+            thumbnail_result(future, path, max_size, encoding) for future, path in zip(futures, image_file_paths)
+        ]
 
-    row = 1
+# Function to work out the thumbnail encoding of a run, spreading options.size_budget
+# (MB for the whole workbook) evenly over its images
+def get_thumbnail_encoding(options, image_count):
+    max_bytes = None
+    if options.size_budget and image_count:
+        # Leave room for the sheet XML and the workbook's own files
+        max_bytes = max(int(options.size_budget * 1048576 * SIZE_BUDGET_IMAGE_SHARE / image_count), 1)
+    return ThumbnailEncoding(options.thumbnail_format, options.thumbnail_quality, max_bytes)
+
+# Function to compute a perceptual hash of a still: a 64-bit difference hash (the still
+# averaged down to a small grey grid, one bit per pixel brighter than its right-hand
+# neighbour) plus its mean color. Re-encoded or slightly noisy copies of a frame land a few
+# bits apart rather than on the same hash, so stills are compared with StillMatcher, and
+# the mean color keeps flat frames of different colors apart
+def still_fingerprint(image_file_path):
+    from PIL import Image, ImageStat
+
+    with Image.open(image_file_path) as image:
+        # Let draft-capable decoders (JPEG) decode at a fraction of the size
+        image.draft("RGB", (DEDUP_HASH_WIDTH * 8, DEDUP_HASH_HEIGHT * 8))
+        if image.mode == "P":
+            image = image.convert("RGB")
+        # Shrink by an integer factor first (Image.reduce), then average to the grid
+        small = image.resize((DEDUP_HASH_WIDTH, DEDUP_HASH_HEIGHT), Image.BOX, reducing_gap=2.0).convert("RGB")
+
+    mean_color = tuple(round(level) for level in ImageStat.Stat(small).mean)
+    pixels = small.convert("L").tobytes()
+    fingerprint = 0
+    for row in range(DEDUP_HASH_HEIGHT):
+        for col in range(DEDUP_HASH_WIDTH - 1):
+            left = pixels[row * DEDUP_HASH_WIDTH + col]
+            right = pixels[row * DEDUP_HASH_WIDTH + col + 1]
+            fingerprint = fingerprint << 1 | (left > right)
+    return fingerprint, mean_color
+
+# Class for finding the earlier still a still duplicates: the first one added whose hash is
+# at most DEDUP_HASH_DISTANCE bits away and whose mean color is within DEDUP_COLOR_TOLERANCE.
+# Hashes are indexed by each of their 8 bytes; hashes fewer than 8 bits apart share at least
+# one byte, so only stills sharing a byte are compared
+class StillMatcher:
+    def __init__(self):
+        self.fingerprints = []
+        self.values = []
+        # (byte position, byte value) -> numbers of the stills with that byte
+        self.index = {}
+
+    # Return the value added with the first matching still, or None
+    def find(self, fingerprint):
+        hash_bits, mean_color = fingerprint
+        candidates = set()
+        for position in range(8):
+            candidates.update(self.index.get((position, hash_bits >> position * 8 & 0xFF), ()))
+        for number in sorted(candidates):
+            other_bits, other_color = self.fingerprints[number]
+            if bin(hash_bits ^ other_bits).count("1") > DEDUP_HASH_DISTANCE:
+                continue
+            if all(abs(level - other) <= DEDUP_COLOR_TOLERANCE for level, other in zip(mean_color, other_color)):
+                return self.values[number]
+        return None
+
+    # Remember a still that later stills can match
+    def add(self, fingerprint, value):
+        number = len(self.fingerprints)
+        self.fingerprints.append(fingerprint)
+        self.values.append(value)
+        for position in range(8):
+            self.index.setdefault((position, fingerprint[0] >> position * 8 & 0xFF), []).append(number)
+
+# Function to wait for a fingerprint job, redoing it here if the worker pool died
+def fingerprint_result(future, image_file_path):
+    from concurrent.futures.process import BrokenProcessPool
+
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        return still_fingerprint(image_file_path)
+
+# Class for counting what deduplication saved in one run
+class DedupStats:
+    def __init__(self):
+        self.stills = 0
+        self.duplicates = 0
+        # Thumbnails of the representatives standing in for duplicates, added up at the end
+        self.reused = []
+
+    def summary(self):
+        saved_bytes = sum(len(thumbnail[0]) for thumbnail in self.reused)
+        return (
+            f"Deduplication: {self.duplicates} of {self.stills} stills matched an earlier one; "
+            f"{self.duplicates} thumbnails and {saved_bytes / 1048576:.2f} MB of embedded images saved"
+        )
 
-    # Get the current gallery and still album
-    gallery = currentProject.GetGallery()
-    currentStillAlbum = gallery.GetCurrentStillAlbum()
+# Function to build thumbnails for many stills, making only one per group of matching
+# perceptual hashes; every duplicate gets the thumbnail of the first still it matches
+def make_deduplicated_thumbnails(image_file_paths, max_size, workers=None, encoding=None):
+    stats = DedupStats()
+    with create_thumbnail_executor(workers) as pool:
+        fingerprints = [
+            fingerprint_result(future, path)
+            for future, path in zip([pool.submit(still_fingerprint, path) for path in image_file_paths], image_file_paths)
+        ]
+        # Stills that no earlier still matches, with their thumbnail jobs
+        representatives = StillMatcher()
+        jobs = []
+        duplicate = []
+        for fingerprint, path in zip(fingerprints, image_file_paths):
+            job = representatives.find(fingerprint)
+            duplicate.append(job is not None)
+            if job is None:
+                job = (pool.submit(make_thumbnail, path, max_size, encoding), path)
+                representatives.add(fingerprint, job)
+            jobs.append(job)
+        thumbnails = [thumbnail_result(future, path, max_size, encoding) for future, path in jobs]
+
+    stats.stills = len(image_file_paths)
+    stats.duplicates = sum(duplicate)
+    stats.reused = [thumbnail for thumbnail, is_duplicate in zip(thumbnails, duplicate) if is_duplicate]
+    print(stats.summary())
+    return thumbnails
+
+# Function to find the per-user cache folder for thumbnails
+def get_default_cache_path():
+    if platform.system() == "Windows":
+        base_path = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    elif platform.system() == "Darwin":  # macOS
+        base_path = os.path.expanduser("~/Library/Caches")
+    else:
+        base_path = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base_path, "shotlist_creator2", "thumbnails")
+
+# Class for the on-disk thumbnail cache shared by all runs and projects. Thumbnails are
+# stored under a hash of (media pool item ID, source frame, size, encoding), and the
+# least recently used ones are evicted once the cache grows past max_bytes
+class ThumbnailCache:
+    def __init__(self, path=None, max_bytes=THUMBNAIL_CACHE_SIZE):
+        self.path = path or get_default_cache_path()
+        os.makedirs(self.path, exist_ok=True)
+        self.max_bytes = max_bytes
+        # The writer thread stores thumbnails while the Resolve stage looks them up
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        # Cached file name -> [last use, size]
+        self.entries = {}
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(".thumb"):
+                stat = entry.stat()
+                self.entries[entry.name] = [stat.st_mtime, stat.st_size]
+        self.total_bytes = sum(size for _, size in self.entries.values())
+
+    # Return the cache key for a source frame rendered at a size and encoding
+    @staticmethod
+    def key(clip_id, source_frame, max_size, encoding):
+        text = json.dumps([clip_id, source_frame, round(float(max_size), 3), encoding])
+        return hashlib.sha1(text.encode("utf-8")).hexdigest() + ".thumb"
+
+    # Return the cached (image_data, width, height), or None
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            file_path = os.path.join(self.path, key)
+            try:
+                with open(file_path, "rb") as cache_file:
+                    size_line = cache_file.readline()
+                    image_data = cache_file.read()
+                width, height = (int(value) for value in size_line.split())
+                # Mark the entry as recently used
+                os.utime(file_path)
+            except (OSError, ValueError):
+                self.misses += 1
+                self._remove(key)
+                return None
+            self.entries[key][0] = time.time()
+            self.hits += 1
+            return image_data, width, height
+
+    # Store a thumbnail, evicting the least recently used entries when over the cap
+    def put(self, key, thumbnail):
+        image_data, width, height = thumbnail
+        with self.lock:
+            if key in self.entries:
+                return
+            file_path = os.path.join(self.path, key)
+            try:
+                # Written to a temporary file first so a crash never leaves a torn entry
+                with open(file_path + ".tmp", "wb") as cache_file:
+                    cache_file.write(f"{width} {height}\n".encode("ascii"))
+                    cache_file.write(image_data)
+                os.replace(file_path + ".tmp", file_path)
+            except OSError as error:
+                print(f"Could not store thumbnail in cache ({error}).")
+                return
+            size = os.path.getsize(file_path)
+            self.entries[key] = [time.time(), size]
+            self.total_bytes += size
+            self.stores += 1
+            self._evict()
+
+    def _remove(self, key):
+        _, size = self.entries.pop(key, (0, 0))
+        self.total_bytes -= size
+        try:
+            os.remove(os.path.join(self.path, key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key, _ in sorted(self.entries.items(), key=lambda item: item[1][0]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            self._remove(key)
+            self.evictions += 1
 
-    # Get all the stills in the current still album
-    stills = currentStillAlbum.GetStills()
+    def summary(self):
+        return (
+            f"Thumbnail cache: {self.hits} hits, {self.misses} misses, {self.stores} stored, "
+            f"{self.evictions} evicted, {self.total_bytes / 1048576:.1f} MB in {self.path}"
+        )
 
-    for idx, (frame, marker) in enumerate(markers.items()):
-        col = 0
-        # Prepare data row
-        data_row = {}
-        # Add standard fields
-        data_row["Frame"] = frame
-        data_row["Name"] = marker["name"]
-        data_row["Note"] = marker["note"]
-        data_row["Duration"] = marker["duration"]
-        data_row["Color"] = marker["color"]
-        data_row["Timecode"] = timecodes[idx]
-
-        # Add metadata
-        clip_metadata = metadata_list[idx]
-        data_row.update(clip_metadata)
+# Thumbnails of one run found in the shared thumbnail cache ({frame: thumbnail}) and the key
+# each marker's new thumbnail is stored under ({frame: key}, None for markers not to cache)
+@dataclasses.dataclass
+class CacheLookup:
+    cache: ThumbnailCache = None
+    keys: dict = dataclasses.field(default_factory=dict)
+    thumbnails: dict = dataclasses.field(default_factory=dict)
+
+# Function to look the markers up in the shared thumbnail cache when options.thumbnail_cache
+# is set. Only sources on a media pool clip get a key: an item name doesn't tell two titles
+# apart. Frames in skip_frames already have their still and are only given a key
+def lookup_cached_thumbnails(sources, options, encoding, skip_frames=()):
+    lookup = CacheLookup()
+    if not options.thumbnail_cache:
+        return lookup
+    lookup.cache = ThumbnailCache(options.thumbnail_cache_path, options.thumbnail_cache_size)
+    for frame, source in sources.items():
+        if source is None or not source[2]:
+            lookup.keys[frame] = None
+            continue
+        lookup.keys[frame] = ThumbnailCache.key(source[0], source[1], options.image_size, encoding.label())
+        if frame not in skip_frames:
+            thumbnail = lookup.cache.get(lookup.keys[frame])
+            if thumbnail is not None:
+                lookup.thumbnails[frame] = thumbnail
+    return lookup
+
+# Function to export stills in batched calls, returning one exported file path per still
+def export_stills(album, stills, staging_path, chunk_size=EXPORT_CHUNK_SIZE):
+    exported_paths = [None] * len(stills)
+    indexes = [index for index, still in enumerate(stills) if still]
+
+    for chunk_start in range(0, len(indexes), chunk_size):
+        chunk = indexes[chunk_start:chunk_start + chunk_size]
+
+        # Label each still with its position so its file can be matched after export,
+        # and give the stills their own gallery labels back afterwards
+        labels = {}
+        try:
+            for index in chunk:
+                labels[index] = album.GetLabel(stills[index])
+                album.SetLabel(stills[index], f"row{index:05d}")
+
+            # Every chunk gets its own empty folder, so only its own files are listed
+            chunk_path = tempfile.mkdtemp(prefix="chunk_", dir=staging_path)
+            album.ExportStills([stills[index] for index in chunk], chunk_path, "still", "png")
+        finally:
+            for index, label in labels.items():
+                album.SetLabel(stills[index], label or "")
+        for file in os.listdir(chunk_path):
+            match = re.search(r"row(\d{5})", file)
+            if match and file.endswith(".png"):
+                exported_paths[int(match.group(1))] = os.path.join(chunk_path, file)
+
+        # Export anything the labels didn't identify on its own, into a folder of its own
+        for index in chunk:
+            if exported_paths[index] is None:
+                still_path = tempfile.mkdtemp(prefix="still_", dir=staging_path)
+                album.ExportStills([stills[index]], still_path, "still", "png")
+                files = [file for file in os.listdir(still_path) if file.endswith(".png")]
+                if files:
+                    exported_paths[index] = os.path.join(still_path, files[0])
+
+    return exported_paths
+
+# Class for the progress journal of a run: a header line followed by one JSON line per
+# completed marker (frame, timecode, clip metadata and exported still), flushed as it goes
+class ProgressJournal:
+    def __init__(self, output_path, timeline_name, resume=True):
+        self.path = os.path.join(output_path, JOURNAL_FILENAME)
+        self.timeline_name = timeline_name
+        # Completed markers by frame
+        self.entries = {}
+        valid_size = self._load() if resume else 0
+
+        # Drop a line torn by a crash (or the whole journal when not resuming) before appending
+        self.file = open(self.path, "ab")
+        self.file.truncate(valid_size)
+        if not valid_size:
+            self._append({"journal": 1, "timeline": timeline_name})
+
+    # Read the completed markers back, returning the size of the intact part of the file
+    def _load(self):
+        if not os.path.exists(self.path):
+            return 0
+        valid_size = 0
+        with open(self.path, "rb") as journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                if valid_size == 0 and entry.get("timeline") != self.timeline_name:
+                    # A journal from another timeline is started over
+                    return 0
+                if "frame" in entry:
+                    self.entries[int(entry["frame"])] = entry
+                valid_size += len(line)
+        return valid_size
+
+    def _append(self, entry):
+        self.file.write(json.dumps(entry, default=str).encode("utf-8") + b"\n")
+        self.file.flush()
+
+    # Return the journal entry of a completed marker, or None
+    def completed(self, frame):
+        return self.entries.get(int(frame))
+
+    # Record a completed marker; the still is stored relative to the output folder
+    def record(self, frame, timecode, clip_metadata, image_file_path):
+        entry = {
+            "frame": frame,
+            "timecode": timecode,
+            "metadata": dict(clip_metadata),
+            "still": os.path.basename(image_file_path),
+        }
+        self.entries[int(frame)] = entry
+        self._append(entry)
+
+    def close(self):
+        self.file.close()
+
+    # Delete the journal once the workbook is complete
+    def remove(self):
+        self.close()
+        os.remove(self.path)
+
+# Function to find the source under every marker: {frame: (clip ID, source frame, cacheable)},
+# or None for markers with no clip under them. Items with no media pool clip (titles,
+# generators) fall back to their name as the clip ID and are not cacheable
+def marker_sources(markers, start_frame, item_index):
+    # Source clip ID and offset per timeline item, fetched once per item
+    item_sources = {}
+    sources = {}
+    for frame in markers:
+        timeline_frame = start_frame + frame
+        item = item_index.item_at(timeline_frame)
+        if not item:
+            sources[int(frame)] = None
+            continue
+        if id(item) not in item_sources:
+            media_pool_item = item.GetMediaPoolItem()
+            clip_id = media_pool_item.GetUniqueId() if media_pool_item else item.GetName()
+            item_sources[id(item)] = (clip_id, item.GetLeftOffset() - item.GetStart(), bool(media_pool_item))
+        clip_id, offset, cacheable = item_sources[id(item)]
+        sources[int(frame)] = (clip_id, int(offset + timeline_frame), cacheable)
+    return sources
+
+# Function to fingerprint every marker: its name, note, color and duration plus the
+# source clip and source frame under it, so edits to either make it "changed"
+def marker_fingerprints(markers, sources):
+    fingerprints = {}
+    for frame, marker in markers.items():
+        fields = [marker.get("name"), marker.get("note"), marker.get("color"), marker.get("duration")]
+        text = json.dumps(fields + list((sources.get(int(frame)) or ("", 0))[:2]), default=str)
+        fingerprints[int(frame)] = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    return fingerprints
+
+# Function to get the manifest path of a workbook
+def get_manifest_path(output_path, excel_filename):
+    return os.path.join(output_path, os.path.splitext(excel_filename)[0] + MANIFEST_SUFFIX)
+
+# Function to read a workbook's manifest: {frame: {"hash", "still"}} (empty when there is none)
+def load_manifest(output_path, excel_filename):
+    try:
+        with open(get_manifest_path(output_path, excel_filename), encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+    return {int(frame): entry for frame, entry in manifest.get("markers", {}).items()}
+
+# Function to save a workbook's manifest (written to a temporary file, then swapped in)
+def save_manifest(output_path, excel_filename, timeline_name, entries):
+    manifest_path = get_manifest_path(output_path, excel_filename)
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as manifest_file:
+        json.dump({"timeline": timeline_name, "markers": entries}, manifest_file)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+# Function to build the sheet row for a marker from its fields and clip metadata
+def build_data_row(frame, marker, timecode, clip_metadata):
+    # Add standard fields
+    data_row = {
+        "Frame": frame,
+        "Name": marker["name"],
+        "Note": marker["note"],
+        "Duration": marker["duration"],
+        "Color": marker["color"],
+        "Timecode": timecode,
+    }
+    # Add metadata
+    data_row.update(clip_metadata)
+    return data_row
+
+# Function to move an exported still to its final name in the output folder; returns the final path
+def place_still(exported_path, output_path, new_name):
+    # The output folder belongs to this run, so a file already there is an old still
+    # of this export and is replaced
+    image_file_path = os.path.normpath(os.path.join(output_path, new_name))
+    os.replace(exported_path, image_file_path)
+    # The folder is published under its final name once the export is done
+    print(new_name)
+    return image_file_path
+
+# Class for one shotlist sheet of a workbook, filled one complete row at a time, in row order.
+# In constant-memory mode each row is flushed to disk once the next one starts,
+# so every row is written completely (cells, image, height) in a single call
+class ShotlistSheet:
+    def __init__(self, workbook, styles, selected_fields, sheet_name=None):
+        self.worksheet = workbook.add_worksheet(sheet_name)
+        self.styles = styles
+        self.selected_fields = selected_fields
+
+        # Prepare headers
+        headers = selected_fields + ["Still"]
+
+        # Write header row
+        for col_num, header in enumerate(headers):
+            self.worksheet.write(0, col_num, header, self.styles.text)
+
+        # Column widths are worked out while writing instead of autofitting afterwards
+        self.column_widths = ColumnWidthTracker(headers)
+
+        # Adjust column index for the image based on added columns
+        self.image_col_index = len(headers) - 1  # Since headers include 'Still' at the end
+
+    # Write the fields of a marker row and its thumbnail ((image_data, width, height) or None)
+    def write_row(self, row, data_row, image_file_path=None, thumbnail=None):
+        worksheet = self.worksheet
 
         # Write selected fields to worksheet
-        for field in selected_fields:
+        for col, field in enumerate(self.selected_fields):
             if field == "Color":
-                worksheet.write(
-                    row, col, "", get_color_format(workbook, data_row.get(field, ""))
-                )
+                worksheet.write(row, col, "", self.styles.color(data_row.get(field, "")))
             else:
-                worksheet.write(row, col, data_row.get(field, ""), text_format)
-            col += 1
-        row += 1
-
-    # Adjust column index for the image based on added columns
-    image_col_index = len(headers) - 1  # Since headers include 'Still' at the end
-
-    row = 1
-
-    # Loop through the stills and export them using a unique temporary file name for each still
-    for i, still in enumerate(stills):
-        # Generate a unique suffix for the temporary file name
-        suffix = f"{i + 1:03}"
-        tmp_name = f"tmp_{suffix}"
-        # Export the still to the output folder using PNG format and the unique temporary file name
-        currentStillAlbum.ExportStills([still], output_path, tmp_name, "png")
-
-    # Create a list of file names in the folder, sorted by name
-    files = sorted(os.listdir(output_path))
-
-    for file in files:
-        if file.startswith("tmp") and file.endswith(".png"):
-            # Extract the file number from the file name
-            file_number = int(file.split("_")[1])
-            new_name = f"thumb{file_number:03d}.png"
-
-            while os.path.exists(os.path.join(output_path, new_name)):
-                action = ask_replace_or_rename(new_name)
-                if action == "replace":
-                    os.remove(os.path.join(output_path, new_name))
-                elif action == "rename":
-                    new_name, ok = QtWidgets.QInputDialog.getText(
-                        None, "Rename", "Enter new name for the image:", text=new_name
-                    )
-                    if not ok or not new_name:
-                        return
-                else:
-                    return
-
-            # Rename the file
-            os.rename(
-                os.path.join(output_path, file), os.path.join(output_path, new_name)
-            )
-
-            # Embed the still in the worksheet
-            image_file_path = os.path.normpath(os.path.join(output_path, new_name))
-            print(image_file_path)
+                value = data_row.get(field, "")
+                worksheet.write(row, col, value, self.styles.text)
+                self.column_widths.record(col, value)
+
+        if thumbnail is None:
+            return
+        image_data, new_width, new_height = thumbnail
+
+        # Insert the resized image into the worksheet straight from memory
+        worksheet.insert_image(
+            row,
+            self.image_col_index,
+            image_file_path,
+            {"image_data": io.BytesIO(image_data), "x_scale": 1, "y_scale": 1, "object_position": 1},
+        )
 
-            # Open the image and get its size
-            image = Image.open(image_file_path)
-            width, height = image.size
+        # Set the width and height of the cell to match the image's aspect ratio
+        self.column_widths.record_width(self.image_col_index, new_width / 6)
+        worksheet.set_row(
+            row, new_height / 1.33
+        )
 
-            # Calculate the new size (maintaining aspect ratio)
-            if width > height:
-                new_width = int(max_size)
-                new_height = int((max_size / width) * height)
+    def finish(self):
+        # Size every column once
+        self.column_widths.apply(self.worksheet)
+
+# Class writing a shotlist workbook with a single sheet
+class ShotlistWriter:
+    def __init__(self, workbook_path, selected_fields, constant_memory=False):
+        import xlsxwriter
+
+        self.workbook = xlsxwriter.Workbook(workbook_path, {"constant_memory": constant_memory})
+        self.styles = WorkbookStyles(self.workbook)
+        self.sheet = ShotlistSheet(self.workbook, self.styles, selected_fields)
+
+    def write_row(self, row, data_row, image_file_path=None, thumbnail=None):
+        self.sheet.write_row(row, data_row, image_file_path, thumbnail)
+
+    def close(self):
+        self.sheet.finish()
+        self.workbook.close()
+
+# Function to name the shard a row belongs to: its reel, its marker color or its block of rows
+def get_shard_key(shard_by, row, data_row, shard_rows=SHARD_ROWS):
+    if shard_by == "reel":
+        return str(data_row.get("Reel Name") or "No Reel")
+    if shard_by == "color":
+        return str(data_row.get("Color") or "No Color")
+    first_row = (row - 1) // shard_rows * shard_rows + 1
+    return f"Rows {first_row}-{first_row + shard_rows - 1}"
+
+# Function to turn a shard key into a name Excel accepts for a sheet or a file, unique among used_names
+def get_shard_name(key, used_names, max_length=31):
+    name = re.sub(r"[\[\]:*?/\\'\"<>|]", "_", key).strip() or "Shard"
+    name = name[:max_length]
+    base_name, number = name, 2
+    while name.lower() in used_names:
+        suffix = f" ({number})"
+        name = base_name[:max_length - len(suffix)] + suffix
+        number += 1
+    used_names.add(name.lower())
+    return name
+
+# Function to write one shard workbook (runs in a worker process); rows are
+# (data_row, image_file_path, thumbnail) in order
+def write_shard_workbook(workbook_path, selected_fields, constant_memory, rows):
+    writer = ShotlistWriter(workbook_path, selected_fields, constant_memory)
+    for row, (data_row, image_file_path, thumbnail) in enumerate(rows, start=1):
+        writer.write_row(row, data_row, image_file_path, thumbnail)
+    writer.close()
+    return workbook_path
+
+# Class writing the shotlist split by reel, marker color or every shard_rows rows, either
+# into one sheet per shard or into one workbook per shard, behind an index sheet linking
+# to every shard. Takes rows like ShotlistWriter (in order, one complete row per call);
+# callers that know the shard of a row themselves (batch runs) pass its key instead
+class ShardedShotlistWriter:
+    def __init__(self, workbook_path, selected_fields, constant_memory=False, shard_by="rows",
+                 shard_rows=SHARD_ROWS, separate_workbooks=False, index_label="Shard"):
+        import xlsxwriter
+
+        self.workbook_path = workbook_path
+        self.selected_fields = selected_fields
+        self.constant_memory = constant_memory
+        self.shard_by = shard_by
+        self.shard_rows = shard_rows
+        self.separate_workbooks = separate_workbooks
+        self.index_label = index_label
+
+        # The workbook holding the index, first, and with separate_workbooks off every shard sheet
+        self.workbook = xlsxwriter.Workbook(workbook_path, {"constant_memory": constant_memory})
+        self.styles = WorkbookStyles(self.workbook)
+        self.index_sheet = self.workbook.add_worksheet("Index")
+        self.used_names = {"index"}
+
+        # Shard key -> {"name", "count", "first", "last", and "sheet" or buffered "rows"}
+        self.shards = {}
+        # Shard workbooks are written by a worker pool while rows keep coming in
+        self.executor = None
+        self.futures = []
+
+    def _shard(self, key):
+        shard = self.shards.get(key)
+        if shard is None:
+            shard = {
+                "name": get_shard_name(key, self.used_names), "count": 0, "first": None, "last": None, "finished": False,
+            }
+            if self.separate_workbooks:
+                shard["rows"] = []
             else:
-                new_height = int(max_size)
-                new_width = int((max_size / height) * width)
-
-            # Resize the image
-            resized_image = image.resize((new_width, new_height))
-
-            # Save the resized image back to the file
-            resized_image.save(image_file_path)
+                shard["sheet"] = ShotlistSheet(self.workbook, self.styles, self.selected_fields, shard["name"])
+            self.shards[key] = shard
+        return shard
+
+    def _shard_path(self, shard):
+        stem = os.path.splitext(self.workbook_path)[0]
+        return f"{stem}_{shard['name']}.xlsx"
+
+    # Hand a shard's buffered rows to the worker pool
+    def _submit(self, shard):
+        if self.executor is None:
+            self.executor = create_thumbnail_executor()
+        rows, shard["rows"] = shard["rows"], []
+        self.futures.append(self.executor.submit(
+            write_shard_workbook, self._shard_path(shard), self.selected_fields, self.constant_memory, rows
+        ))
+
+    def write_row(self, row, data_row, image_file_path=None, thumbnail=None, key=None):
+        if key is None:
+            key = get_shard_key(self.shard_by, row, data_row, self.shard_rows)
+        shard = self._shard(key)
+        shard["count"] += 1
+        timecode = data_row.get("Timecode", "")
+        shard["first"] = shard["first"] or timecode
+        shard["last"] = timecode
+        if not self.separate_workbooks:
+            shard["sheet"].write_row(shard["count"], data_row, image_file_path, thumbnail)
+            return
+
+        # Blocks of rows are complete as soon as they are full, since rows come in order;
+        # reel and color shards are only complete once every row has been seen
+        shard["rows"].append((data_row, image_file_path, thumbnail))
+        if self.shard_by == "rows" and shard["count"] == self.shard_rows:
+            self._submit(shard)
+
+    # Mark a shard as complete, handing its workbook to the worker pool right away
+    def finish_shard(self, key):
+        shard = self.shards.get(key)
+        if shard is None or shard["finished"]:
+            return
+        if self.separate_workbooks:
+            if shard["rows"]:
+                self._submit(shard)
+        else:
+            shard["sheet"].finish()
+        shard["finished"] = True
+
+    def _write_index(self):
+        headers = [self.index_label, "Markers", "First Timecode", "Last Timecode"]
+        column_widths = ColumnWidthTracker(headers)
+        for col, header in enumerate(headers):
+            self.index_sheet.write(0, col, header, self.styles.text)
+        for row, (key, shard) in enumerate(self.shards.items(), start=1):
+            if self.separate_workbooks:
+                link = "external:" + os.path.basename(self._shard_path(shard))
+            else:
+                link = f"internal:'{shard['name']}'!A1"
+            self.index_sheet.write_url(row, 0, link, string=key)
+            for col, value in enumerate([key, shard["count"], shard["first"], shard["last"]]):
+                if col:
+                    self.index_sheet.write(row, col, value, self.styles.text)
+                column_widths.record(col, value)
+        column_widths.apply(self.index_sheet)
+
+    def close(self):
+        try:
+            for key in self.shards:
+                self.finish_shard(key)
+            # Surface the first failed shard workbook
+            for future in self.futures:
+                future.result()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+        self._write_index()
+        self.workbook.close()
+
+# Class presenting one shard of a ShardedShotlistWriter as a writer of its own, so a batch
+# run can hand every timeline's pipeline its own sheet (or workbook) of one report
+class ShardWriter:
+    def __init__(self, sharded_writer, key):
+        self.sharded_writer = sharded_writer
+        self.key = key
+
+    def write_row(self, row, data_row, image_file_path=None, thumbnail=None):
+        self.sharded_writer.write_row(row, data_row, image_file_path, thumbnail, self.key)
+
+    # Closing a shard finishes it; the report is closed once every timeline is done
+    def close(self):
+        self.sharded_writer.finish_shard(self.key)
+
+# Function to create the writer for a workbook: a single sheet, or sharded when shard_by is set
+def create_shotlist_writer(workbook_path, selected_fields, constant_memory=False, shard_by=None,
+                           shard_rows=SHARD_ROWS, separate_workbooks=False):
+    if not shard_by:
+        return ShotlistWriter(workbook_path, selected_fields, constant_memory)
+    return ShardedShotlistWriter(
+        workbook_path, selected_fields, constant_memory, shard_by, shard_rows, separate_workbooks
+    )
 
-            # Insert the resized image into the worksheet
-            worksheet.insert_image(
-                row,
-                image_col_index,
-                image_file_path,
-                {"x_scale": 1, "y_scale": 1, "object_position": 1},
-            )
+# Function to decode a thumbnail ((image_data, width, height), PNG or JPEG) into an RGB image
+def decode_thumbnail(thumbnail):
+    from PIL import Image
+
+    if thumbnail is None:
+        return None
+    with Image.open(io.BytesIO(thumbnail[0])) as image:
+        return image.convert("RGB")
+
+# Function to load the font of the contact sheets (the bitmap default on Pillow without FreeType)
+def load_contact_sheet_font(size=CONTACT_SHEET_FONT_SIZE):
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        return ImageFont.load_default()
+
+# Function to shorten text with an ellipsis until it fits max_width pixels
+def fit_text(draw, text, font, max_width):
+    if draw.textlength(text, font=font) <= max_width:
+        return text
+    while text and draw.textlength(text + "…", font=font) > max_width:
+        text = text[:-1]
+    return text + "…"
+
+# Function to remove the files of a previous export that this one didn't write again
+def remove_stale_files(folder_path, written_names):
+    for name in os.listdir(folder_path):
+        if name not in written_names:
+            os.remove(os.path.join(folder_path, name))
+
+# Class writing a paginated PDF contact sheet: a grid of thumbnails with the selected fields
+# under each one. Every page is appended to the file as soon as it is full, so only one
+# page of thumbnails is held in memory
+class PdfContactSheetWriter:
+    def __init__(self, pdf_path, selected_fields):
+        self.pdf_path = pdf_path
+        self.part_path = pdf_path + ".part"
+        self.selected_fields = selected_fields
+        self.font = load_contact_sheet_font()
+        self.cells = []
+        self.page_count = 0
+
+    def write_row(self, row, data_row, image_file_path=None, thumbnail=None):
+        self.cells.append((data_row, decode_thumbnail(thumbnail)))
+        columns, rows = CONTACT_SHEET_GRID
+        if len(self.cells) == columns * rows:
+            self._write_page()
+
+    def _render_page(self):
+        from PIL import Image, ImageDraw
+
+        page_width, page_height = CONTACT_SHEET_PAGE_SIZE
+        margin = CONTACT_SHEET_MARGIN
+        columns, rows = CONTACT_SHEET_GRID
+        line_height = CONTACT_SHEET_FONT_SIZE + 4
+        page = Image.new("RGB", CONTACT_SHEET_PAGE_SIZE, "white")
+        draw = ImageDraw.Draw(page)
+
+        # Footer with the file name and page number
+        title = os.path.splitext(os.path.basename(self.pdf_path))[0]
+        draw.text((margin, page_height - margin + 10), f"{title} - page {self.page_count + 1}", fill="gray", font=self.font)
+
+        cell_width = (page_width - 2 * margin) // columns
+        cell_height = (page_height - 2 * margin) // rows
+        lines = [field for field in self.selected_fields if field != "Color"]
+        image_height = cell_height - 10 - line_height * len(lines)
+        # Keep at least half of each cell for the thumbnail; fields that don't fit are left out
+        if image_height < cell_height // 2:
+            image_height = cell_height // 2
+            lines = lines[:(cell_height - 10 - image_height) // line_height]
+
+        for index, (data_row, image) in enumerate(self.cells):
+            left = margin + index % columns * cell_width
+            top = margin + index // columns * cell_height
+            box_width = cell_width - 10
+            if image is not None:
+                image.thumbnail((box_width, image_height))
+                page.paste(image, (left + (box_width - image.width) // 2, top + (image_height - image.height) // 2))
+            else:
+                draw.rectangle((left, top, left + box_width, top + image_height), outline="lightgray")
+                draw.text((left + 8, top + 8), "No still", fill="gray", font=self.font)
+
+            # Marker color as a swatch along the bottom of the thumbnail
+            if "Color" in self.selected_fields and data_row.get("Color") in MARKER_COLORS:
+                draw.rectangle(
+                    (left, top + image_height - 6, left + box_width, top + image_height),
+                    fill=MARKER_COLORS[data_row["Color"]],
+                )
 
-            # Set the width and height of the cell to match the image's aspect ratio
-            worksheet.set_column(
-                image_col_index, image_col_index, new_width / 6
-            )
-            worksheet.set_row(
-                row, new_height / 1.33
-            )
+            text_top = top + image_height + 4
+            for field in lines:
+                text = fit_text(draw, f"{field}: {data_row.get(field, '')}", self.font, box_width)
+                draw.text((left, text_top), text, fill="black", font=self.font)
+                text_top += line_height
+        return page
+
+    def _write_page(self):
+        page = self._render_page()
+        page.save(self.part_path, "PDF", resolution=CONTACT_SHEET_DPI, append=self.page_count > 0)
+        self.page_count += 1
+        self.cells = []
+
+    def close(self):
+        if self.cells or not self.page_count:
+            self._write_page()
+        os.replace(self.part_path, self.pdf_path)
+
+# Class writing a static HTML contact sheet: the thumbnails are saved into a folder next to
+# the page and loaded lazily by the browser, so even thousands of markers open instantly
+class HtmlContactSheetWriter:
+    def __init__(self, html_path, selected_fields):
+        import html
+
+        self.html_path = html_path
+        self.part_path = html_path + ".part"
+        self.selected_fields = selected_fields
+        self.image_folder = os.path.splitext(html_path)[0] + "_files"
+        os.makedirs(self.image_folder, exist_ok=True)
+        self.written_images = set()
+
+        title = html.escape(os.path.splitext(os.path.basename(html_path))[0])
+        self.file = open(self.part_path, "w", encoding="utf-8")
+        self.file.write(
+            "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+            f"<title>{title}</title>\n<style>\n"
+            "body { font-family: sans-serif; margin: 24px; background: #f4f4f4; }\n"
+            ".sheet { display: grid; grid-template-columns: repeat(auto-fill, minmax(280px, 1fr)); gap: 16px; }\n"
+            "figure { margin: 0; padding: 8px; background: white; border-top: 6px solid #ffffff; }\n"
+            "img { width: 100%; height: auto; display: block; }\n"
+            ".missing { padding: 40px 0; text-align: center; color: gray; background: #eeeeee; }\n"
+            "dl { display: grid; grid-template-columns: auto 1fr; gap: 2px 8px; margin: 8px 0 0; font-size: 13px; }\n"
+            "dt { color: gray; }\ndd { margin: 0; overflow-wrap: anywhere; }\n"
+            f"</style>\n</head>\n<body>\n<h1>{title}</h1>\n<div class=\"sheet\">\n"
+        )
 
-            row += 1
+    def write_row(self, row, data_row, image_file_path=None, thumbnail=None):
+        import html
+        from urllib.parse import quote
+
+        color = MARKER_COLORS.get(data_row.get("Color"), "#FFFFFF") if "Color" in self.selected_fields else "#FFFFFF"
+        parts = [f"<figure style=\"border-top-color: {color}\">"]
+        if thumbnail is not None:
+            image_data, width, height = thumbnail
+            extension = "jpg" if image_data.startswith(b"\xff\xd8") else "png"
+            image_name = f"{row:05d}.{extension}"
+            with open(os.path.join(self.image_folder, image_name), "wb") as image_file:
+                image_file.write(image_data)
+            self.written_images.add(image_name)
+            source = quote(f"{os.path.basename(self.image_folder)}/{image_name}")
+            parts.append(f"<img src=\"{source}\" width=\"{width}\" height=\"{height}\" loading=\"lazy\" alt=\"\">")
+        else:
+            parts.append("<div class=\"missing\">No still</div>")
+        parts.append("<dl>")
+        for field in self.selected_fields:
+            if field != "Color":
+                parts.append(f"<dt>{html.escape(field)}</dt><dd>{html.escape(str(data_row.get(field, '')))}</dd>")
+        parts.append("</dl></figure>\n")
+        self.file.write("".join(parts))
+
+    def close(self):
+        self.file.write("</div>\n</body>\n</html>\n")
+        self.file.close()
+        remove_stale_files(self.image_folder, self.written_images)
+        os.replace(self.part_path, self.html_path)
+
+# Function to lay tiles (RGB images or None, at most cell_size) out in a grid of columns.
+# With numpy, the tiles are copied into one array of cells that a single reshape turns into
+# the page; without it, they are pasted one by one
+def compose_mosaic(tiles, columns, cell_size, background=MOSAIC_BACKGROUND):
+    from PIL import Image
+
+    cell_width, cell_height = cell_size
+    rows = -(-len(tiles) // columns)
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+
+    if numpy is None:
+        page = Image.new("RGB", (columns * cell_width, rows * cell_height), background)
+        for index, tile in enumerate(tiles):
+            if tile is not None:
+                left = index % columns * cell_width + (cell_width - tile.width) // 2
+                page.paste(tile, (left, index // columns * cell_height))
+        return page
+
+    cells = numpy.empty((rows * columns, cell_height, cell_width, 3), numpy.uint8)
+    cells[:] = background
+    for index, tile in enumerate(tiles):
+        if tile is not None:
+            left = (cell_width - tile.width) // 2
+            cells[index, :tile.height, left:left + tile.width] = numpy.asarray(tile)
+    page = cells.reshape(rows, columns, cell_height, cell_width, 3).swapaxes(1, 2)
+    return Image.fromarray(numpy.ascontiguousarray(page).reshape(rows * cell_height, columns * cell_width, 3))
+
+# Class writing the thumbnails as tiled PNG mosaic pages (mosaic_001.png, ...) into a folder,
+# each tile labelled with its marker name and timecode
+class MosaicWriter:
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        os.makedirs(folder_path, exist_ok=True)
+        self.font = load_contact_sheet_font()
+        self.tiles = []
+        self.written_pages = set()
+
+    def write_row(self, row, data_row, image_file_path=None, thumbnail=None):
+        label = " ".join(str(data_row.get(field) or "") for field in ("Name", "Timecode")).strip() or f"Row {row}"
+        self.tiles.append((label, decode_thumbnail(thumbnail)))
+        columns, rows = MOSAIC_GRID
+        if len(self.tiles) == columns * rows:
+            self._write_page()
+
+    def _write_page(self):
+        from PIL import ImageDraw
+
+        images = [image for _, image in self.tiles]
+        sizes = [image.size for image in images if image is not None] or [(IMAGE_SIZES["SMALL"], IMAGE_SIZES["SMALL"] // 2)]
+        cell_width = max(width for width, _ in sizes) + MOSAIC_GAP
+        image_height = max(height for _, height in sizes)
+        columns = MOSAIC_GRID[0]
+        page = compose_mosaic(images, columns, (cell_width, image_height + MOSAIC_LABEL_HEIGHT))
+
+        # Labels go on once the tiles are in place
+        draw = ImageDraw.Draw(page)
+        for index, (label, _) in enumerate(self.tiles):
+            left = index % columns * cell_width
+            top = index // columns * (image_height + MOSAIC_LABEL_HEIGHT) + image_height + 4
+            draw.text((left + 4, top), fit_text(draw, label, self.font, cell_width - 8), fill="white", font=self.font)
+
+        page_name = f"mosaic_{len(self.written_pages) + 1:03d}.png"
+        page.save(os.path.join(self.folder_path, page_name))
+        self.written_pages.add(page_name)
+        self.tiles = []
+
+    def close(self):
+        if self.tiles:
+            self._write_page()
+        remove_stale_files(self.folder_path, self.written_pages)
+
+# Class passing every row to several writers, e.g. the workbook and its contact sheets
+class MultiWriter:
+    def __init__(self, writers):
+        self.writers = writers
+
+    def write_row(self, row, data_row, image_file_path=None, thumbnail=None):
+        for writer in self.writers:
+            writer.write_row(row, data_row, image_file_path, thumbnail)
+
+    def close(self):
+        for writer in self.writers:
+            writer.close()
+
+# Function to add the chosen contact sheets ("pdf", "html", "mosaic") to the writer of a
+# workbook; they are named after the workbook and fed the same rows and thumbnails
+def add_contact_sheets(writer, workbook_path, selected_fields, contact_sheets=()):
+    if not contact_sheets:
+        return writer
+    stem = os.path.splitext(workbook_path)[0]
+    writers = [writer]
+    if "pdf" in contact_sheets:
+        writers.append(PdfContactSheetWriter(stem + ".pdf", selected_fields))
+    if "html" in contact_sheets:
+        writers.append(HtmlContactSheetWriter(stem + ".html", selected_fields))
+    if "mosaic" in contact_sheets:
+        writers.append(MosaicWriter(stem + "_mosaic"))
+    return MultiWriter(writers)
+
+# Function to export markers and create an Excel file laid out by options (fields, image
+# size, sharding, dedup, thumbnail encoding and contact sheets). Markers with a thumbnail in
+# cached (a CacheLookup) use it instead of a still, and new thumbnails are stored in its cache
+def export_markers(timeline, output_path, timecodes, excel_filename, metadata_list, options, stills=None, album=None, markers=None, cached=None):
+    if markers is None:
+        markers = timeline.GetMarkers()
+    if cached is None:
+        cached = CacheLookup()
+    frames = [int(frame) for frame in markers]
+
+    # Work out the marker timecodes from their frames when the caller didn't record them
+    if timecodes is None:
+        fps, drop_frame = get_timeline_rate(timeline)
+        timecodes = frames_to_timecodes(markers, fps, drop_frame, timeline.GetStartFrame())
 
-    # Autofit the worksheet columns
-    worksheet.autofit()
+    # Set image size based on user selection
+    max_size = options.image_size
 
-    workbook.close()
+    # Get the current gallery and still album
+    currentStillAlbum = album
+    if currentStillAlbum is None:
+        gallery = get_resolve().GetProjectManager().GetCurrentProject().GetGallery()
+        currentStillAlbum = gallery.GetCurrentStillAlbum()
+
+    # Use the stills grabbed for each marker (still i belongs to marker i),
+    # or fall back to every still in the current still album
+    if stills is None:
+        stills = currentStillAlbum.GetStills()
+
+    # Export the stills in batched calls into a temporary folder inside the output folder
+    staging_path = tempfile.mkdtemp(prefix=".stills_", dir=output_path)
+    try:
+        with trace_span("export"):
+            exported_paths = export_stills(currentStillAlbum, stills, staging_path)
+
+        # Stills to embed and the rows they belong to
+        image_rows = []
+        image_file_paths = []
+
+        for i, exported_path in enumerate(exported_paths):
+            if exported_path is None:
+                continue
+            image_file_path = place_still(exported_path, output_path, f"thumb{i + 1:03d}.png")
+            image_rows.append(i + 1)
+            image_file_paths.append(image_file_path)
+
+        # Keep a copy of every cached thumbnail with the other stills
+        cached_rows = {}
+        for i, frame in enumerate(frames):
+            if frame in cached.thumbnails:
+                cached_path = os.path.join(staging_path, f"cached_{i + 1}.png")
+                with open(cached_path, "wb") as cached_file:
+                    cached_file.write(thumbnail_as_png(cached.thumbnails[frame][0]))
+                image_file_path = place_still(cached_path, output_path, f"thumb{i + 1:03d}.png")
+                cached_rows[i + 1] = (image_file_path, cached.thumbnails[frame])
+    finally:
+        # Remove the staging folder along with the .drx files Resolve writes next to stills
+        shutil.rmtree(staging_path, ignore_errors=True)
+
+    # Decode and downsample all stills in parallel; the thumbnails stay in memory. The
+    # encoding is worked out per marker, as in run_pipeline, so cache keys match
+    encoding = get_thumbnail_encoding(options, len(markers))
+    with trace_span("resize"):
+        if options.dedup_stills:
+            thumbnails = make_deduplicated_thumbnails(image_file_paths, max_size, encoding=encoding)
+        else:
+            thumbnails = make_thumbnails(image_file_paths, max_size, encoding=encoding)
+    row_images = dict(zip(image_rows, zip(image_file_paths, thumbnails)))
+    if cached.cache is not None:
+        for row, (_, thumbnail) in row_images.items():
+            cache_key = cached.keys.get(frames[row - 1])
+            if cache_key is not None:
+                cached.cache.put(cache_key, thumbnail)
+        print(cached.cache.summary())
+    row_images.update(cached_rows)
+
+    writer = create_shotlist_writer(
+        os.path.join(output_path, excel_filename), options.selected_fields, options.constant_memory,
+        options.shard_by, options.shard_rows, options.shard_workbooks,
+    )
+    writer = add_contact_sheets(
+        writer, os.path.join(output_path, excel_filename), options.selected_fields, options.contact_sheets
+    )
+    for idx, (frame, marker) in enumerate(markers.items()):
+        row = idx + 1
+        data_row = build_data_row(frame, marker, timecodes[idx], metadata_list[idx])
+        image_file_path, thumbnail = row_images.get(row, (None, None))
+        with trace_span("write"):
+            writer.write_row(row, data_row, image_file_path, thumbnail)
+    with trace_span("save"):
+        writer.close()
 
 # Function to set a dark theme for the application
 def set_dark_theme(app):
+    from PySide6 import QtCore, QtGui
     # Set the Fusion style
     app.setStyle('Fusion')
     # Now set a dark palette
@@ -312,157 +2139,346 @@ def set_dark_theme(app):
 
     app.setPalette(dark_palette)
 
-# Class for the combined user input dialog
-class UserInputDialog(QtWidgets.QDialog):
-    def __init__(self, all_fields, parent=None):
-        super(UserInputDialog, self).__init__(parent)
-        self.setWindowTitle("Shotlist Creator Options")
-
-        layout = QtWidgets.QVBoxLayout(self)
-
-        instructions = QtWidgets.QLabel("Please set the options below:")
-        layout.addWidget(instructions)
-
-        # Timecode input
-        timecode_label = QtWidgets.QLabel("Enter custom timecode (default is 01:00:00:00):")
-        layout.addWidget(timecode_label)
-
-        self.timecode_input = QtWidgets.QLineEdit()
-        self.timecode_input.setText("01:00:00:00")
-        layout.addWidget(self.timecode_input)
-
-        # Checkbox for deleting stills
-        self.delete_stills_checkbox = QtWidgets.QCheckBox("Delete all stills from the gallery album")
-        layout.addWidget(self.delete_stills_checkbox)
-
-        # Metadata selection
-        metadata_label = QtWidgets.QLabel("Select the metadata fields to include:")
-        layout.addWidget(metadata_label)
-
-        scroll_area = QtWidgets.QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        scroll_content = QtWidgets.QWidget()
-        scroll_layout = QtWidgets.QVBoxLayout(scroll_content)
-
-        # Default selected fields and order
-        default_selected_fields = [
-            "Frame", "Timecode", "Name", "Note", "Duration", "Color",
-            "Clip Name", "FPS", "File Path", "Video Codec",
-            "Resolution", "Start TC", "End TC"
-        ]
-
-        # Create checkboxes for all metadata fields
-        self.checkboxes = []
-        for key in all_fields:
-            checkbox = QtWidgets.QCheckBox(key)
-            if key in default_selected_fields:
-                checkbox.setChecked(True)
-            scroll_layout.addWidget(checkbox)
-            self.checkboxes.append(checkbox)
-
-        scroll_content.setLayout(scroll_layout)
-        scroll_area.setWidget(scroll_content)
-        layout.addWidget(scroll_area)
-
-        # Select All and Deselect All buttons
-        button_layout = QtWidgets.QHBoxLayout()
-        select_all_button = QtWidgets.QPushButton("Select All")
-        deselect_all_button = QtWidgets.QPushButton("Deselect All")
-        button_layout.addWidget(select_all_button)
-        button_layout.addWidget(deselect_all_button)
-        layout.addLayout(button_layout)
-
-        # Dropdown for selecting image size
-        size_label = QtWidgets.QLabel("Choose the size for the still images:")
-        layout.addWidget(size_label)
-
-        size_layout = QtWidgets.QHBoxLayout()
-        self.size_combo = QtWidgets.QComboBox()
-        self.size_combo.addItems(["SMALL", "LARGE", "CUSTOM"])
-        size_layout.addWidget(self.size_combo)
-
-        # Input for custom size (hidden by default)
-        self.custom_size_input = QtWidgets.QDoubleSpinBox()
-        self.custom_size_input.setRange(0.1, 10)
-        self.custom_size_input.setSingleStep(0.1)
-        self.custom_size_input.setValue(1)
-        self.custom_size_input.setVisible(False)
-        size_layout.addWidget(self.custom_size_input)
-
-        layout.addLayout(size_layout)
-
-        # Show custom size input when "CUSTOM" is selected
-        def on_size_change():
-            self.custom_size_input.setVisible(self.size_combo.currentText() == "CUSTOM")
-
-        self.size_combo.currentIndexChanged.connect(on_size_change)
-
-        # OK and Cancel buttons
-        ok_cancel_layout = QtWidgets.QHBoxLayout()
-        ok_button = QtWidgets.QPushButton("OK")
-        cancel_button = QtWidgets.QPushButton("Cancel")
-        ok_cancel_layout.addWidget(ok_button)
-        ok_cancel_layout.addWidget(cancel_button)
-        layout.addLayout(ok_cancel_layout)
-
-        # Functions to select/deselect all
-        def select_all():
-            for checkbox in self.checkboxes:
-                checkbox.setChecked(True)
-
-        def deselect_all():
-            for checkbox in self.checkboxes:
-                checkbox.setChecked(False)
-
-        select_all_button.clicked.connect(select_all)
-        deselect_all_button.clicked.connect(deselect_all)
-
-        # Function to handle OK and Cancel
-        ok_button.clicked.connect(self.accept)
-        cancel_button.clicked.connect(self.reject)
-
-    def get_values(self):
-        selected_fields = [checkbox.text() for checkbox in self.checkboxes if checkbox.isChecked()]
-        size = self.size_combo.currentText()
-        if size == "CUSTOM":
-            multiplier = self.custom_size_input.value()
-            image_size = 260 * multiplier
-        elif size == "LARGE":
-            image_size = 520
-        else:
-            image_size = 260  # SMALL
-        timecode = self.timecode_input.text() if self.timecode_input.text() else "01:00:00:00"
-        delete_stills = self.delete_stills_checkbox.isChecked()
-        return selected_fields, image_size, timecode, delete_stills
-
-if __name__ == "__main__":
-    # Create a Qt Application instance
-    app = QtWidgets.QApplication.instance()
-    if not app:
-        app = QtWidgets.QApplication([])
-    # Set dark theme
-    set_dark_theme(app)
-
-    # Get the current project and timeline
-    projectManager = resolve.GetProjectManager()
-    currentProject = projectManager.GetCurrentProject()
-    currentTimeline = currentProject.GetCurrentTimeline()
-
-    # Get the project name
-    project_name = currentProject.GetName()
-
-    # Get all metadata keys from the first clip (assuming all clips have the same keys)
-    markers = currentTimeline.GetMarkers()
+# Standard marker fields offered before the clip metadata fields
+STANDARD_FIELDS = ["Frame", "Timecode", "Name", "Note", "Duration", "Color"]
+
+# Default selected fields and order
+DEFAULT_FIELDS = [
+    "Frame", "Timecode", "Name", "Note", "Duration", "Color",
+    "Clip Name", "FPS", "File Path", "Video Codec",
+    "Resolution", "Start TC", "End TC"
+]
+
+# Longest side of the thumbnails in pixels; CUSTOM is a multiple of SMALL
+IMAGE_SIZES = {"SMALL": 260, "LARGE": 520}
+
+# Function to turn a size choice (SMALL, LARGE, CUSTOM or a plain multiplier) into pixels
+def get_image_size(size, multiplier=1):
+    size = str(size).upper()
+    if size in IMAGE_SIZES:
+        return IMAGE_SIZES[size]
+    if size == "CUSTOM":
+        return IMAGE_SIZES["SMALL"] * multiplier
+    return IMAGE_SIZES["SMALL"] * float(size)
+
+# Options for one export run, filled in from the dialog or the command line
+@dataclasses.dataclass
+class ExportOptions:
+    selected_fields: list = dataclasses.field(default_factory=lambda: list(DEFAULT_FIELDS))
+    image_size: float = IMAGE_SIZES["SMALL"]
+    # Timecode to park the playhead on first (None leaves it where it is)
+    start_timecode: str = None
+    delete_stills: bool = False
+    keyboard_seek: bool = False
+    constant_memory: bool = False
+    # Overlap grabbing, resizing and writing (False runs the phases one after another)
+    pipelined: bool = True
+    # Continue an unfinished pipelined run from its progress journal
+    resume: bool = False
+    # Re-export into the previous output folder, grabbing only markers that changed
+    incremental: bool = False
+    # Shared on-disk thumbnail cache (None path means the per-user cache folder); off by
+    # default, since its keys can't tell a regraded frame from the one cached before
+    thumbnail_cache: bool = False
+    thumbnail_cache_path: str = None
+    thumbnail_cache_size: int = THUMBNAIL_CACHE_SIZE
+    # Split the shotlist by "reel", "color" or "rows" (every shard_rows rows); None keeps one sheet
+    shard_by: str = None
+    shard_rows: int = SHARD_ROWS
+    # Write each shard to a workbook of its own instead of a sheet of the main workbook
+    shard_workbooks: bool = False
+    # Make and embed one thumbnail per group of perceptually identical stills
+    dedup_stills: bool = False
+    # Thumbnail format ("png", "png8" or "jpeg"), JPEG quality and workbook size budget in MB
+    thumbnail_format: str = "png"
+    thumbnail_quality: int = THUMBNAIL_QUALITY
+    size_budget: float = None
+    # Only markers matching this MarkerFilter are grabbed and exported (None exports all)
+    marker_filter: MarkerFilter = None
+    # Contact sheets written next to the workbook: any of "pdf", "html" and "mosaic"
+    contact_sheets: list = dataclasses.field(default_factory=list)
+    # "ask" shows dialogs; "replace", "rename" or "cancel" decide without asking
+    conflict_policy: str = "ask"
+
+# Function to create the combined user input dialog (Qt is imported only when it is shown)
+def create_user_input_dialog(all_fields, default_timecode="01:00:00:00", parent=None):
+    from PySide6 import QtWidgets
+
+    # Class for the combined user input dialog
+    class UserInputDialog(QtWidgets.QDialog):
+        def __init__(self, all_fields, default_timecode="01:00:00:00", parent=None):
+            super(UserInputDialog, self).__init__(parent)
+            self.setWindowTitle("Shotlist Creator Options")
+
+            layout = QtWidgets.QVBoxLayout(self)
+
+            instructions = QtWidgets.QLabel("Please set the options below:")
+            layout.addWidget(instructions)
+
+            # Timecode input
+            self.default_timecode = default_timecode
+            timecode_label = QtWidgets.QLabel(f"Enter custom timecode (default is {default_timecode}):")
+            layout.addWidget(timecode_label)
+
+            self.timecode_input = QtWidgets.QLineEdit()
+            self.timecode_input.setText(default_timecode)
+            layout.addWidget(self.timecode_input)
+
+            # Checkbox for deleting stills
+            self.delete_stills_checkbox = QtWidgets.QCheckBox("Delete all stills from the gallery album")
+            layout.addWidget(self.delete_stills_checkbox)
+
+            # Checkbox for the legacy hotkey navigation
+            self.keyboard_seek_checkbox = QtWidgets.QCheckBox('Navigate with the "Next Marker" hotkey (legacy)')
+            layout.addWidget(self.keyboard_seek_checkbox)
+
+            # Checkbox for the constant-memory workbook writer
+            self.constant_memory_checkbox = QtWidgets.QCheckBox("Low-memory writer (for very long timelines)")
+            layout.addWidget(self.constant_memory_checkbox)
+
+            # Checkbox for incremental re-exports
+            self.incremental_checkbox = QtWidgets.QCheckBox("Only regrab markers changed since the last export to this file")
+            layout.addWidget(self.incremental_checkbox)
+
+            # Checkbox for the shared thumbnail cache
+            self.thumbnail_cache_checkbox = QtWidgets.QCheckBox("Reuse cached thumbnails of the same source frames (leave unticked after regrading)")
+            layout.addWidget(self.thumbnail_cache_checkbox)
+
+            # Checkbox for perceptual-hash deduplication of stills
+            self.dedup_checkbox = QtWidgets.QCheckBox("Embed one image for identical-looking stills (hold frames, repeated plates)")
+            layout.addWidget(self.dedup_checkbox)
+
+            # Marker filter: only matching markers are grabbed and exported
+            filter_label = QtWidgets.QLabel("Only export markers matching (leave empty for all markers):")
+            layout.addWidget(filter_label)
+
+            filter_layout = QtWidgets.QHBoxLayout()
+            self.filter_colors_input = QtWidgets.QLineEdit()
+            self.filter_colors_input.setPlaceholderText("Colors, e.g. Red, Blue")
+            filter_layout.addWidget(self.filter_colors_input)
+            self.filter_name_input = QtWidgets.QLineEdit()
+            self.filter_name_input.setPlaceholderText("Name (regex)")
+            filter_layout.addWidget(self.filter_name_input)
+            self.filter_note_input = QtWidgets.QLineEdit()
+            self.filter_note_input.setPlaceholderText("Note (regex)")
+            filter_layout.addWidget(self.filter_note_input)
+            self.filter_range_input = QtWidgets.QLineEdit()
+            self.filter_range_input.setPlaceholderText("Range, e.g. 01:00:00:00-01:05:00:00")
+            filter_layout.addWidget(self.filter_range_input)
+            layout.addLayout(filter_layout)
+
+            filter_options_layout = QtWidgets.QHBoxLayout()
+            self.filter_custom_data_checkbox = QtWidgets.QCheckBox("Only markers with custom data")
+            filter_options_layout.addWidget(self.filter_custom_data_checkbox)
+            load_filter_button = QtWidgets.QPushButton("Load Filter File...")
+            filter_options_layout.addWidget(load_filter_button)
+            layout.addLayout(filter_options_layout)
+
+            # Durations and other criteria only a filter file sets are kept from the loaded file
+            self.loaded_filter = MarkerFilter()
+
+            def load_filter():
+                filter_path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Load Marker Filter", "", "JSON Files (*.json)")
+                if not filter_path:
+                    return
+                try:
+                    self.loaded_filter = MarkerFilter.load(filter_path)
+                except (OSError, ValueError, TypeError, re.error) as error:
+                    QtWidgets.QMessageBox.warning(self, "Marker Filter", f"Could not load {filter_path}:\n{error}")
+                    return
+                self.filter_colors_input.setText(", ".join(self.loaded_filter.colors or []))
+                self.filter_name_input.setText(self.loaded_filter.name or "")
+                self.filter_note_input.setText(self.loaded_filter.note or "")
+                self.filter_range_input.setText(", ".join(
+                    "-".join(str(part) for part in parse_marker_range(marker_range))
+                    for marker_range in self.loaded_filter.ranges or []
+                ))
+                self.filter_custom_data_checkbox.setChecked(bool(self.loaded_filter.custom_data))
+
+            load_filter_button.clicked.connect(load_filter)
+
+            # Metadata selection
+            metadata_label = QtWidgets.QLabel("Select the metadata fields to include:")
+            layout.addWidget(metadata_label)
+
+            scroll_area = QtWidgets.QScrollArea()
+            scroll_area.setWidgetResizable(True)
+            scroll_content = QtWidgets.QWidget()
+            scroll_layout = QtWidgets.QVBoxLayout(scroll_content)
+
+            # Create checkboxes for all metadata fields
+            self.checkboxes = []
+            for key in all_fields:
+                checkbox = QtWidgets.QCheckBox(key)
+                if key in DEFAULT_FIELDS:
+                    checkbox.setChecked(True)
+                scroll_layout.addWidget(checkbox)
+                self.checkboxes.append(checkbox)
+
+            scroll_content.setLayout(scroll_layout)
+            scroll_area.setWidget(scroll_content)
+            layout.addWidget(scroll_area)
+
+            # Select All and Deselect All buttons
+            button_layout = QtWidgets.QHBoxLayout()
+            select_all_button = QtWidgets.QPushButton("Select All")
+            deselect_all_button = QtWidgets.QPushButton("Deselect All")
+            button_layout.addWidget(select_all_button)
+            button_layout.addWidget(deselect_all_button)
+            layout.addLayout(button_layout)
+
+            # Dropdown for selecting image size
+            size_label = QtWidgets.QLabel("Choose the size for the still images:")
+            layout.addWidget(size_label)
+
+            size_layout = QtWidgets.QHBoxLayout()
+            self.size_combo = QtWidgets.QComboBox()
+            self.size_combo.addItems(["SMALL", "LARGE", "CUSTOM"])
+            size_layout.addWidget(self.size_combo)
+
+            # Input for custom size (hidden by default)
+            self.custom_size_input = QtWidgets.QDoubleSpinBox()
+            self.custom_size_input.setRange(0.1, 10)
+            self.custom_size_input.setSingleStep(0.1)
+            self.custom_size_input.setValue(1)
+            self.custom_size_input.setVisible(False)
+            size_layout.addWidget(self.custom_size_input)
+
+            layout.addLayout(size_layout)
+
+            # Show custom size input when "CUSTOM" is selected
+            def on_size_change():
+                self.custom_size_input.setVisible(self.size_combo.currentText() == "CUSTOM")
+
+            self.size_combo.currentIndexChanged.connect(on_size_change)
+
+            # Thumbnail format, JPEG quality and workbook size budget
+            format_label = QtWidgets.QLabel("Thumbnail format, JPEG quality and workbook size budget (MB, 0 for none):")
+            layout.addWidget(format_label)
+
+            format_layout = QtWidgets.QHBoxLayout()
+            self.format_combo = QtWidgets.QComboBox()
+            self.format_combo.addItems(["PNG", "PNG (256 colors)", "JPEG"])
+            format_layout.addWidget(self.format_combo)
+
+            self.quality_input = QtWidgets.QSpinBox()
+            self.quality_input.setRange(JPEG_MIN_QUALITY, 100)
+            self.quality_input.setValue(THUMBNAIL_QUALITY)
+            format_layout.addWidget(self.quality_input)
+
+            self.budget_input = QtWidgets.QDoubleSpinBox()
+            self.budget_input.setRange(0, 100000)
+            self.budget_input.setValue(0)
+            format_layout.addWidget(self.budget_input)
+            layout.addLayout(format_layout)
+
+            # Dropdown for splitting long shotlists into shards behind an index sheet
+            split_label = QtWidgets.QLabel("Split the shotlist (an index sheet links to every part):")
+            layout.addWidget(split_label)
+
+            split_layout = QtWidgets.QHBoxLayout()
+            self.split_combo = QtWidgets.QComboBox()
+            self.split_combo.addItems(["No split", "By reel", "By marker color", "Every N rows"])
+            split_layout.addWidget(self.split_combo)
+
+            # Rows per part (hidden unless splitting every N rows)
+            self.split_rows_input = QtWidgets.QSpinBox()
+            self.split_rows_input.setRange(10, 100000)
+            self.split_rows_input.setValue(SHARD_ROWS)
+            self.split_rows_input.setVisible(False)
+            split_layout.addWidget(self.split_rows_input)
+
+            self.split_workbooks_checkbox = QtWidgets.QCheckBox("Separate workbooks")
+            split_layout.addWidget(self.split_workbooks_checkbox)
+            layout.addLayout(split_layout)
+
+            def on_split_change():
+                self.split_rows_input.setVisible(self.split_combo.currentText() == "Every N rows")
+
+            self.split_combo.currentIndexChanged.connect(on_split_change)
+
+            # Checkboxes for contact sheets written next to the workbook
+            contact_label = QtWidgets.QLabel("Also write contact sheets (no need to print the workbook):")
+            layout.addWidget(contact_label)
+
+            contact_layout = QtWidgets.QHBoxLayout()
+            self.contact_sheet_checkboxes = {}
+            for contact_format, text in zip(CONTACT_SHEET_FORMATS, ["PDF", "HTML page", "PNG mosaic"]):
+                checkbox = QtWidgets.QCheckBox(text)
+                contact_layout.addWidget(checkbox)
+                self.contact_sheet_checkboxes[contact_format] = checkbox
+            layout.addLayout(contact_layout)
+
+            # OK and Cancel buttons
+            ok_cancel_layout = QtWidgets.QHBoxLayout()
+            ok_button = QtWidgets.QPushButton("OK")
+            cancel_button = QtWidgets.QPushButton("Cancel")
+            ok_cancel_layout.addWidget(ok_button)
+            ok_cancel_layout.addWidget(cancel_button)
+            layout.addLayout(ok_cancel_layout)
+
+            # Functions to select/deselect all
+            def select_all():
+                for checkbox in self.checkboxes:
+                    checkbox.setChecked(True)
+
+            def deselect_all():
+                for checkbox in self.checkboxes:
+                    checkbox.setChecked(False)
+
+            select_all_button.clicked.connect(select_all)
+            deselect_all_button.clicked.connect(deselect_all)
+
+            # Function to handle OK and Cancel
+            ok_button.clicked.connect(self.accept)
+            cancel_button.clicked.connect(self.reject)
+
+        # Function to turn the dialog's choices into the ExportOptions of the run
+        def get_values(self):
+            marker_filter = dataclasses.replace(
+                self.loaded_filter,
+                colors=[color.strip() for color in self.filter_colors_input.text().split(",") if color.strip()] or None,
+                name=self.filter_name_input.text() or None,
+                note=self.filter_note_input.text() or None,
+                ranges=[part.strip() for part in self.filter_range_input.text().split(",") if part.strip()] or None,
+                custom_data=True if self.filter_custom_data_checkbox.isChecked() else (
+                    False if self.loaded_filter.custom_data is False else None
+                ),
+            )
+            return ExportOptions(
+                selected_fields=[checkbox.text() for checkbox in self.checkboxes if checkbox.isChecked()],
+                image_size=get_image_size(self.size_combo.currentText(), self.custom_size_input.value()),
+                start_timecode=self.timecode_input.text() or self.default_timecode,
+                delete_stills=self.delete_stills_checkbox.isChecked(),
+                keyboard_seek=self.keyboard_seek_checkbox.isChecked(),
+                constant_memory=self.constant_memory_checkbox.isChecked(),
+                incremental=self.incremental_checkbox.isChecked(),
+                thumbnail_cache=self.thumbnail_cache_checkbox.isChecked(),
+                shard_by={"By reel": "reel", "By marker color": "color", "Every N rows": "rows"}.get(self.split_combo.currentText()),
+                shard_rows=self.split_rows_input.value(),
+                shard_workbooks=self.split_workbooks_checkbox.isChecked(),
+                dedup_stills=self.dedup_checkbox.isChecked(),
+                thumbnail_format={"PNG (256 colors)": "png8", "JPEG": "jpeg"}.get(self.format_combo.currentText(), "png"),
+                thumbnail_quality=self.quality_input.value(),
+                size_budget=self.budget_input.value() or None,
+                marker_filter=marker_filter,
+                contact_sheets=[
+                    contact_format for contact_format, checkbox in self.contact_sheet_checkboxes.items()
+                    if checkbox.isChecked()
+                ],
+            )
 
-    # Initialize a list to store metadata
-    metadata_list = []
+    return UserInputDialog(all_fields, default_timecode, parent)
 
+# Function to list the fields the user can pick: marker fields plus the clip properties
+def get_available_fields(timeline, property_cache):
     # Get the clip at the current playhead position to extract metadata keys
-    current_clip = currentTimeline.GetCurrentVideoItem()
+    # (assuming all clips have the same keys)
+    current_clip = timeline.GetCurrentVideoItem()
     if current_clip:
         media_pool_item = current_clip.GetMediaPoolItem()
         if media_pool_item:
-            clip_properties = media_pool_item.GetClipProperty()
+            clip_properties = property_cache.get(media_pool_item)
             # Include all properties
             all_metadata_keys = list(clip_properties.keys())
         else:
@@ -471,132 +2487,808 @@ if __name__ == "__main__":
         all_metadata_keys = []
 
     # Add standard fields to metadata keys
-    standard_fields = ["Frame", "Timecode", "Name", "Note", "Duration", "Color"]
-    all_fields = standard_fields + all_metadata_keys
+    all_fields = STANDARD_FIELDS + all_metadata_keys
 
     # Remove duplicates while preserving order
     seen = set()
-    all_fields = [x for x in all_fields if not (x in seen or seen.add(x))]
+    return [x for x in all_fields if not (x in seen or seen.add(x))]
 
-    # Show the combined user input dialog
-    dialog = UserInputDialog(all_fields)
-    if dialog.exec() == QtWidgets.QDialog.Accepted:
-        selected_fields, image_size, timecode_to_set, delete_stills = dialog.get_values()
+# Function to delete every still in the current gallery album
+def delete_album_stills(resolve, project):
+    # Switch to the color page for stills deletion
+    resolve.OpenPage("color")
 
-        if not selected_fields:
-            print("No metadata fields selected.")
-        else:
-            # Set the timecode
-            currentTimeline.SetCurrentTimecode(timecode_to_set)
-
-            # Check if the user wants to delete the stills
-            if delete_stills:
-                # Switch to the color page for stills deletion
-                resolve.OpenPage("color")
-
-                # Get the current gallery and still album
-                gallery = currentProject.GetGallery()
-                currentStillAlbum = gallery.GetCurrentStillAlbum()
+    # Get the current gallery and still album
+    gallery = project.GetGallery()
+    currentStillAlbum = gallery.GetCurrentStillAlbum()
 
-                # Get all the stills in the album
-                stills = currentStillAlbum.GetStills()
+    # Get all the stills in the album
+    stills = currentStillAlbum.GetStills()
 
-                if stills:
-                    success = currentStillAlbum.DeleteStills(stills)
-                    if success:
-                        print("All stills have been successfully deleted.")
+    if stills:
+        success = currentStillAlbum.DeleteStills(stills)
+        if success:
+            print("All stills have been successfully deleted.")
+        else:
+            print("Failed to delete stills.")
+    else:
+        print("No stills found in the album.")
+
+# Function to visit every marker and grab its still, yielding
+# (frame, marker, timecode, clip_metadata, still) as each marker is done
+# Markers whose frame is in skip_frames are yielded with a None still and not visited, and so
+# are markers the playhead did not reach in time
+# Only the markers matching options.marker_filter are visited (pass markers to reuse a filtered dict)
+def grab_marker_stills(resolve, project, timeline, options, property_cache=None, skip_frames=(), item_index=None,
+                       markers=None):
+    # Set the timecode
+    if options.start_timecode:
+        timeline.SetCurrentTimecode(options.start_timecode)
+
+    # Check if the user wants to delete the stills
+    if options.delete_stills:
+        delete_album_stills(resolve, project)
+
+    # Get the markers from the timeline
+    if markers is None:
+        markers = get_markers(timeline, options.marker_filter)
+
+    # The "Next Marker" hotkey stops on every marker, so filtered runs seek directly
+    keyboard_seek = options.keyboard_seek
+    if keyboard_seek and options.marker_filter is not None and not options.marker_filter.is_empty():
+        print("Seeking directly to the filtered markers instead of using the hotkey.")
+        keyboard_seek = False
+
+    # Ensure focus is back on the timeline/edit page before keyboard pressing
+    if keyboard_seek:
+        focus_on_timeline()
+
+    # Marker keys are frame offsets from the timeline start
+    start_frame = timeline.GetStartFrame()
+    fps, drop_frame = get_timeline_rate(timeline)
+    marker_timecodes = frames_to_timecodes(markers, fps, drop_frame, start_frame)
+
+    # Collect clip metadata for every marker up front from the track layout
+    with trace_span("metadata"):
+        if item_index is None:
+            item_index = TimelineItemIndex(timeline, property_cache)
+        metadata_list = [item_index.clip_metadata(start_frame + frame_id) for frame_id in markers]
+    if property_cache is not None:
+        print(property_cache.summary())
+
+    # Loop through each marker on the timeline
+    for i, (frame_id, marker) in enumerate(markers.items()):
+        # Calculate the number of markers until the end of the timeline
+        numMarkersToEnd = len(markers) - (i + 1)
+
+        # Print the number of markers until the end of the timeline
+        print("Number of markers until the end of the timeline:", numMarkersToEnd)
+
+        if int(frame_id) in skip_frames:
+            yield frame_id, marker, marker_timecodes[i], metadata_list[i], None
+            continue
+
+        with trace_span("seek"):
+            if keyboard_seek:
+                # Send a "0" key press event to move to the next marker
+                currentTimecode = seek_with_keyboard(timeline)
+            else:
+                # Seek straight to the marker and wait until the playhead is there
+                currentTimecode = marker_timecodes[i]
+                if not seek_to_timecode(timeline, currentTimecode):
+                    # A still grabbed now would belong to whatever frame the playhead is on
+                    print(f"Playhead did not reach {currentTimecode} in time; no still for this marker.")
+                    yield frame_id, marker, currentTimecode, metadata_list[i], None
+                    continue
+
+        # Grab a still from the current video clip
+        with trace_span("grab"):
+            galleryStill = timeline.GrabStill()
+
+        yield frame_id, marker, currentTimecode, metadata_list[i], galleryStill
+
+# Function to visit every marker, grab its still and collect its timecode and clip metadata
+# (markers whose frame is in skip_frames are not visited and get a None still)
+def collect_markers(resolve, project, timeline, options, property_cache=None, markers=None, skip_frames=(),
+                    item_index=None):
+    timecodes = []
+    metadata_list = []
+    grabbed_stills = []
+    for _, _, timecode, clip_metadata, still in grab_marker_stills(
+        resolve, project, timeline, options, property_cache, skip_frames, item_index, markers
+    ):
+        timecodes.append(timecode)
+        metadata_list.append(clip_metadata)
+        grabbed_stills.append(still)
+    return timecodes, metadata_list, grabbed_stills
+
+# Function to grab, export, resize and write concurrently. Resolve calls (seek, grab, export)
+# stay on this thread, thumbnails are made in a worker pool and a writer thread fills the
+# sheet in row order, so the run takes about as long as its slowest stage.
+# Every completed marker goes into the progress journal, so a rerun with options.resume
+# skips the markers already done. Rows go to writer when one is given (e.g. a ShardWriter)
+def run_pipeline(resolve, project, timeline, output_path, excel_filename, options, property_cache=None, writer=None):
+    from concurrent.futures import Future
+
+    album = project.GetGallery().GetCurrentStillAlbum()
+    journal = ProgressJournal(output_path, timeline.GetName(), options.resume)
+    # Markers whose still has gone missing are done again
+    for frame, entry in list(journal.entries.items()):
+        if not os.path.exists(os.path.join(output_path, entry["still"])):
+            del journal.entries[frame]
+    if journal.entries:
+        print(f"Resuming: {len(journal.entries)} markers were already done.")
+        # Staging folders left behind by the interrupted run
+        for name in os.listdir(output_path):
+            if name.startswith(".stills_"):
+                shutil.rmtree(os.path.join(output_path, name), ignore_errors=True)
+
+    # Fingerprint the markers; with options.incremental, markers unchanged since the
+    # manifest of the last export keep their still and are not grabbed again
+    item_index = TimelineItemIndex(timeline, property_cache)
+    markers = get_markers(timeline, options.marker_filter)
+    sources = marker_sources(markers, timeline.GetStartFrame(), item_index)
+    fingerprints = marker_fingerprints(markers, sources)
+    reused_stills = {}
+    if options.incremental:
+        for frame, entry in load_manifest(output_path, excel_filename).items():
+            if (
+                fingerprints.get(frame) == entry["hash"]
+                and frame not in journal.entries
+                and os.path.exists(os.path.join(output_path, entry["still"]))
+            ):
+                reused_stills[frame] = entry["still"]
+        print(f"Incremental export: reusing {len(reused_stills)} of {len(fingerprints)} stills.")
+
+    # Markers whose source frame is already in the shared thumbnail cache aren't grabbed either
+    encoding = get_thumbnail_encoding(options, len(markers))
+    cached = lookup_cached_thumbnails(sources, options, encoding, set(journal.entries) | set(reused_stills))
+    thumbnail_cache = cached.cache
+    skip_frames = set(journal.entries) | set(reused_stills) | set(cached.thumbnails)
+
+    # Still names that belong to journalled or reused markers must not be overwritten
+    claimed_stills = {entry["still"] for entry in journal.entries.values()} | set(reused_stills.values())
+    manifest_entries = {}
+
+    if writer is None:
+        writer = create_shotlist_writer(
+            os.path.join(output_path, excel_filename), options.selected_fields, options.constant_memory,
+            options.shard_by, options.shard_rows, options.shard_workbooks,
+        )
+    # Contact sheets go next to the workbook (for batch runs, into each timeline's folder)
+    writer = add_contact_sheets(
+        writer, os.path.join(output_path, excel_filename), options.selected_fields, options.contact_sheets
+    )
+    executor = create_thumbnail_executor()
+
+    # Rows travel to the writer as (row, data_row, image_file_path, thumbnail future, cache key);
+    # the bounded queue holds the Resolve stage back if writing falls behind
+    rows = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    writer_errors = []
+
+    # With options.dedup_stills the Resolve stage sends fingerprint futures instead, and a
+    # dedup stage in between swaps them for the thumbnail of the first still they match
+    dedup_stats = DedupStats() if options.dedup_stills else None
+    fingerprinted_rows = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE) if dedup_stats else rows
+    fingerprint_futures = set()
+
+    def deduplicate_rows():
+        # Thumbnail futures of the stills no earlier still matched
+        representatives = StillMatcher()
+        duplicate_futures = []
+        while True:
+            item = fingerprinted_rows.get()
+            if item is None:
+                break
+            row, data_row, image_file_path, future, cache_key = item
+            if future in fingerprint_futures and not writer_errors:
+                fingerprint_futures.discard(future)
+                try:
+                    with trace_span("fingerprint"):
+                        fingerprint = fingerprint_result(future, image_file_path)
+                    future = representatives.find(fingerprint)
+                    dedup_stats.stills += 1
+                    if future is None:
+                        future = executor.submit(make_thumbnail, image_file_path, options.image_size, encoding)
+                        representatives.add(fingerprint, future)
                     else:
-                        print("Failed to delete stills.")
-                else:
-                    print("No stills found in the album.")
-
-            # Proceed with other actions, such as setting metadata and exporting stills
-
-            # Initialize timecodes list to store the timecodes
-            timecodes = []
-
-            # Initialize a list to store metadata
-            metadata_list = []
-
-            # Ensure focus is back on the timeline/edit page before keyboard pressing
-            focus_on_timeline()
+                        dedup_stats.duplicates += 1
+                        duplicate_futures.append(future)
+                except Exception as error:
+                    writer_errors.append(error)
+            rows.put((row, data_row, image_file_path, future, cache_key))
+        rows.put(None)
+        dedup_stats.reused = [
+            future.result() for future in duplicate_futures if future.done() and not future.exception()
+        ]
 
-            # Get the markers from the timeline
-            markers = currentTimeline.GetMarkers()
+    def write_rows():
+        while True:
+            item = rows.get()
+            if item is None:
+                return
+            if writer_errors:
+                # Keep draining so the Resolve stage never blocks on a full queue
+                continue
+            row, data_row, image_file_path, future, cache_key = item
+            try:
+                thumbnail = None
+                if future is not None:
+                    # Time spent waiting on the worker pool
+                    with trace_span("resize"):
+                        thumbnail = thumbnail_result(future, image_file_path, options.image_size, encoding)
+                    if cache_key is not None:
+                        thumbnail_cache.put(cache_key, thumbnail)
+                with trace_span("write"):
+                    writer.write_row(row, data_row, image_file_path, thumbnail)
+            except Exception as error:
+                writer_errors.append(error)
+
+    writer_thread = threading.Thread(target=write_rows, name="shotlist-writer", daemon=True)
+    writer_thread.start()
+    if dedup_stats:
+        dedup_thread = threading.Thread(target=deduplicate_rows, name="shotlist-dedup", daemon=True)
+        dedup_thread.start()
+
+    staging_path = tempfile.mkdtemp(prefix=".stills_", dir=output_path)
+    pending = []
+
+    # Move a still (exported or written from the cache) to its thumbNNN name
+    def place_row_still(row, source_path):
+        new_name = f"thumb{row:03d}.png"
+        if new_name in claimed_stills:
+            new_name = next_free_name(output_path, new_name)
+        return place_still(source_path, output_path, new_name)
+
+    # Export the pending stills in one call and hand every pending row, in order,
+    # to the resize and write stages. Rows restored from the journal or reused from
+    # the last export already have their image file; cached rows have their thumbnail
+    def flush_pending():
+        to_export = [item for item in pending if item["still"] is not None]
+        with trace_span("export"):
+            exported_paths = export_stills(album, [item["still"] for item in to_export], staging_path, len(to_export) or 1)
+        for item, exported_path in zip(to_export, exported_paths):
+            item["exported_path"] = exported_path
+
+        for item in pending:
+            row, frame = item["row"], int(item["frame"])
+            image_file_path = item["image_file_path"]
+            thumbnail = item["thumbnail"]
+            if thumbnail is not None:
+                # Keep a copy of the cached thumbnail with the other stills
+                cached_path = os.path.join(staging_path, f"cached_{row}.png")
+                with open(cached_path, "wb") as cached_file:
+                    cached_file.write(thumbnail_as_png(thumbnail[0]))
+                item["exported_path"] = cached_path
+            if item.get("exported_path") is not None:
+                image_file_path = place_row_still(row, item["exported_path"])
+                journal.record(item["frame"], item["data_row"]["Timecode"], item["clip_metadata"], image_file_path)
+
+            future = None
+            cache_key = None
+            if thumbnail is not None:
+                future = Future()
+                future.set_result(thumbnail)
+            elif image_file_path is not None:
+                if dedup_stats:
+                    # The dedup stage swaps the fingerprint job for a thumbnail job
+                    future = executor.submit(still_fingerprint, image_file_path)
+                    fingerprint_futures.add(future)
+                else:
+                    future = executor.submit(make_thumbnail, image_file_path, options.image_size, encoding)
+                if thumbnail_cache is not None:
+                    cache_key = cached.keys.get(frame)
+            if image_file_path is not None:
+                manifest_entries[frame] = {"hash": fingerprints.get(frame), "still": os.path.basename(image_file_path)}
+            fingerprinted_rows.put((row, item["data_row"], image_file_path, future, cache_key))
+        pending.clear()
+
+    try:
+        for idx, (frame_id, marker, timecode, clip_metadata, still) in enumerate(
+            grab_marker_stills(resolve, project, timeline, options, property_cache, skip_frames, item_index, markers)
+        ):
+            image_file_path = None
+            entry = journal.completed(frame_id)
+            if entry is not None:
+                # Done in an earlier run: the row is rebuilt from the journal
+                timecode, clip_metadata = entry["timecode"], entry["metadata"]
+                image_file_path = os.path.join(output_path, entry["still"])
+            elif int(frame_id) in reused_stills:
+                # Unchanged since the last export: fresh fields, previous still
+                image_file_path = os.path.join(output_path, reused_stills[int(frame_id)])
+            pending.append({
+                "row": idx + 1,
+                "frame": frame_id,
+                "clip_metadata": clip_metadata,
+                "data_row": build_data_row(frame_id, marker, timecode, clip_metadata),
+                "still": still,
+                "image_file_path": image_file_path,
+                "thumbnail": cached.thumbnails.get(int(frame_id)),
+            })
+            if len(pending) >= PIPELINE_EXPORT_CHUNK_SIZE:
+                flush_pending()
+        if pending:
+            flush_pending()
+    finally:
+        fingerprinted_rows.put(None)
+        if dedup_stats:
+            dedup_thread.join()
+        writer_thread.join()
+        executor.shutdown(cancel_futures=True)
+        # Remove the staging folder along with the .drx files Resolve writes next to stills
+        shutil.rmtree(staging_path, ignore_errors=True)
+        if thumbnail_cache is not None:
+            print(thumbnail_cache.summary())
+        if dedup_stats:
+            print(dedup_stats.summary())
+
+    if writer_errors:
+        # Keep the journal so the run can be resumed; the workbook is only written on
+        # close, so an interrupted run leaves no partial file
+        journal.close()
+        raise writer_errors[0]
+    with trace_span("save"):
+        writer.close()
+    save_manifest(output_path, excel_filename, timeline.GetName(), manifest_entries)
+    journal.remove()
+
+    # Stills of markers that changed or were removed since the last export
+    if options.incremental:
+        current_stills = {entry["still"] for entry in manifest_entries.values()}
+        for name in os.listdir(output_path):
+            if re.fullmatch(r"thumb\d+(_\d+)?\.png", name) and name not in current_stills:
+                os.remove(os.path.join(output_path, name))
+
+# Function to check for the progress journal of an unfinished run in an output folder
+# or, for batch runs, in one of its timeline folders
+def has_unfinished_run(folder_path):
+    if not os.path.isdir(folder_path):
+        return False
+    if os.path.exists(os.path.join(folder_path, JOURNAL_FILENAME)):
+        return True
+    return any(
+        entry.is_dir() and os.path.exists(os.path.join(entry.path, JOURNAL_FILENAME))
+        for entry in os.scandir(folder_path)
+    )
 
-            # Loop through each marker on the timeline
-            for i, (frame_id, marker) in enumerate(markers.items()):
-                # Calculate the number of markers until the end of the timeline
-                numMarkersToEnd = len(markers) - (i + 1)
+# Function to turn a chosen .xlsx path into the OutputFolder of the run, or None when the
+# user cancels. An unfinished run (still in its staging folder, or an incremental run in
+# place) is continued when resume is True (None asks the user), and a subfolder holding a
+# manifest is re-exported in place when incremental is True. Otherwise what to do with an
+# existing subfolder is decided here, once, and the export is built in a new staging folder
+# next to it, to be published when it is complete
+def prepare_output(full_path, conflict_policy="ask", resume=None, incremental=False):
+    output_path, excel_filename = os.path.split(os.path.abspath(full_path))
+    if not excel_filename.endswith(".xlsx"):
+        excel_filename += ".xlsx"
+
+    subfolder_name = os.path.splitext(excel_filename)[0]
+    subfolder_path = os.path.join(output_path, subfolder_name)
+    staging_path = get_staging_path(subfolder_path)
+    # An export that finished but could not be moved into place last time is published now
+    if os.path.exists(os.path.join(staging_path, UNPUBLISHED_FILENAME)):
+        if OutputFolder(staging_path, excel_filename, publish_path=subfolder_path).publish() is None:
+            return None
+        print(f"Published the export finished earlier to {subfolder_path}.")
+    for folder_path, publish_path in ((staging_path, subfolder_path), (subfolder_path, None)):
+        if has_unfinished_run(folder_path):
+            if resume is None:
+                resume = ask_resume(subfolder_name)
+            if resume:
+                return OutputFolder(folder_path, excel_filename, True, publish_path)
+    if incremental and os.path.exists(get_manifest_path(subfolder_path, excel_filename)):
+        return OutputFolder(subfolder_path, excel_filename, True)
+
+    subfolder_path, excel_filename = choose_output_folder(output_path, excel_filename, conflict_policy)
+    if subfolder_path is None:
+        return None
+    # A staging folder left behind by an earlier run that is not being continued
+    staging_path = get_staging_path(subfolder_path)
+    if os.path.exists(staging_path):
+        remove_in_background(staging_path)
+    os.makedirs(staging_path)
+    return OutputFolder(staging_path, excel_filename, False, subfolder_path)
+
+# Function to run the export for one timeline, pipelined or phase by phase
+def run_export(resolve, project, timeline, output_path, excel_filename, options, property_cache=None):
+    # Only pipelined runs keep a journal, so resuming always goes through the pipeline
+    if options.pipelined or options.resume:
+        run_pipeline(resolve, project, timeline, output_path, excel_filename, options, property_cache)
+        return
+
+    markers = get_markers(timeline, options.marker_filter)
+    # Markers whose source frame is in the shared thumbnail cache aren't grabbed
+    cached = CacheLookup()
+    item_index = None
+    if options.thumbnail_cache:
+        item_index = TimelineItemIndex(timeline, property_cache)
+        sources = marker_sources(markers, timeline.GetStartFrame(), item_index)
+        cached = lookup_cached_thumbnails(sources, options, get_thumbnail_encoding(options, len(markers)))
+    timecodes, metadata_list, grabbed_stills = collect_markers(
+        resolve, project, timeline, options, property_cache, markers, set(cached.thumbnails), item_index
+    )
+    export_markers(
+        timeline, output_path, timecodes, excel_filename, metadata_list, options,
+        grabbed_stills, project.GetGallery().GetCurrentStillAlbum(), markers, cached,
+    )
 
-                # Print the number of markers until the end of the timeline
-                print("Number of markers until the end of the timeline:", numMarkersToEnd)
+# Function to find the timelines of a project by name (all of them when names is empty)
+def get_project_timelines(project, names=None):
+    timelines = [project.GetTimelineByIndex(index) for index in range(1, project.GetTimelineCount() + 1)]
+    if not names:
+        return timelines
+    by_name = {timeline.GetName(): timeline for timeline in timelines}
+    for name in names:
+        if name not in by_name:
+            print(f"Timeline {name!r} not found in project {project.GetName()!r}; skipping it.")
+    return [by_name[name] for name in names if name in by_name]
+
+# Function to export many timelines in one session into one report: a sheet per timeline, or
+# with separate_workbooks a workbook per timeline, behind an index sheet. targets is a list of
+# (project name or None for the current project, timeline names or None for all of them).
+# Resolve work stays serial, one timeline after another, while separate timeline workbooks
+# are written by a worker pool as the next timeline is grabbed.
+# Stills go into a subfolder per timeline
+def run_batch(resolve, targets, output_path, excel_filename, options, separate_workbooks=False):
+    project_manager = resolve.GetProjectManager()
+    original_project = project_manager.GetCurrentProject()
+    original_project_name = original_project.GetName() if original_project else None
+    original_timeline = original_project.GetCurrentTimeline() if original_project else None
+    original_timeline_name = original_timeline.GetName() if original_timeline else None
+    several_projects = len({project_name for project_name, _ in targets}) > 1
+
+    report = ShardedShotlistWriter(
+        os.path.join(output_path, excel_filename), options.selected_fields, options.constant_memory,
+        shard_by=None, separate_workbooks=separate_workbooks, index_label="Timeline",
+    )
+    used_folder_names = set()
+    try:
+        for project_name, timeline_names in targets:
+            if project_name is None:
+                project = original_project
+            else:
+                project = project_manager.LoadProject(project_name)
+                if project is None:
+                    print(f"Could not open project {project_name!r}; skipping it.")
+                    continue
+            project_name = project.GetName()
+            # Clip properties are fetched once per media pool item for each project
+            property_cache = ClipPropertyCache()
+
+            for timeline in get_project_timelines(project, timeline_names):
+                timeline_name = timeline.GetName()
+                key = f"{project_name} - {timeline_name}" if several_projects else timeline_name
+                print(f"Exporting {key}...")
+                # Stills are grabbed from the current timeline
+                project.SetCurrentTimeline(timeline)
+                timeline_path = os.path.join(output_path, get_shard_name(key, used_folder_names, 100))
+                os.makedirs(timeline_path, exist_ok=True)
+
+                # When resuming, timelines finished before the interruption have a manifest,
+                # so their stills are reused and only their fields are read again
+                timeline_options = options
+                if options.resume and os.path.exists(get_manifest_path(timeline_path, excel_filename)):
+                    timeline_options = dataclasses.replace(options, incremental=True)
+
+                run_pipeline(
+                    resolve, project, timeline, timeline_path, excel_filename, timeline_options, property_cache,
+                    ShardWriter(report, key),
+                )
+    finally:
+        # Leave Resolve on the project and timeline the batch started from
+        # (looked up again by name, since loading a project replaces its objects)
+        if original_project_name is not None:
+            project = project_manager.GetCurrentProject()
+            if project is None or project.GetName() != original_project_name:
+                project = project_manager.LoadProject(original_project_name)
+            if project is not None and original_timeline_name is not None:
+                for timeline in get_project_timelines(project, [original_timeline_name]):
+                    project.SetCurrentTimeline(timeline)
+
+    report.close()
+
+# Function to run the interactive export with dialogs
+def main_gui():
+    from PySide6 import QtWidgets
 
-                # Send a "0" key press event to move to the next marker
-                keyboard.press("0")
-                keyboard.release("0")
-
-                # Wait for the playhead to move to the next marker
-                time.sleep(0.2)
-
-                # Get the current timecode
-                currentTimecode = currentTimeline.GetCurrentTimecode()
-
-                # Append the current timecode to the list of timecodes
-                timecodes.append(currentTimecode)
-
-                # Grab a still from the current video clip
-                galleryStill = currentTimeline.GrabStill()
-
-                # Get the clip at the current playhead position
-                current_clip = currentTimeline.GetCurrentVideoItem()
-
-                # Extract metadata from the clip
-                clip_metadata = {}
-                if current_clip:
-                    clip_metadata["Clip Name"] = current_clip.GetName()
-                    media_pool_item = current_clip.GetMediaPoolItem()
-                    if media_pool_item:
-                        clip_properties = media_pool_item.GetClipProperty()
-                        # Include all properties
-                        for key, value in clip_properties.items():
-                            clip_metadata[key] = value
-                    else:
-                        # If media_pool_item is None, set properties to "N/A"
-                        clip_metadata["Clip Name"] = current_clip.GetName()
-                else:
-                    # If current_clip is None, set all metadata to "N/A"
-                    clip_metadata["Clip Name"] = "N/A"
+    # Create a Qt Application instance
+    app = QtWidgets.QApplication.instance()
+    if not app:
+        app = QtWidgets.QApplication([])
+    # Set dark theme
+    set_dark_theme(app)
 
-                # Append the metadata to the list
-                metadata_list.append(clip_metadata)
+    # Get the current project and timeline; SHOTLIST_TRACE=<path> turns tracing on
+    resolve = get_resolve()
+    trace_path = os.environ.get("SHOTLIST_TRACE")
+    if trace_path:
+        resolve = start_tracing().wrap(resolve)
+    # Every Resolve call gets a timeout and retries; Qt events are handled while waiting
+    guard = ResolveCallGuard(idle=app.processEvents)
+    resolve = guard.wrap(resolve)
+    projectManager = resolve.GetProjectManager()
+    currentProject = projectManager.GetCurrentProject()
+    currentTimeline = currentProject.GetCurrentTimeline()
 
-                # Check if this is the last marker on the timeline
-                if numMarkersToEnd == 0:
-                    break
+    # Get the project name
+    project_name = currentProject.GetName()
 
-            # Use QFileDialog.getSaveFileName to select both filename and location
-            full_path = get_save_file_name(project_name)
+    # Clip properties are fetched once per media pool item for the whole run
+    property_cache = ClipPropertyCache()
+    all_fields = get_available_fields(currentTimeline, property_cache)
 
-            if not full_path:
-                print("No output folder and filename selected.")
-            else:
-                output_path, excel_filename = os.path.split(full_path)
-                if not excel_filename.endswith(".xlsx"):
-                    excel_filename += ".xlsx"
-
-                # Ask if a subfolder should be created
-                output_path, excel_filename = ask_create_subfolder(output_path, excel_filename)
-
-                if output_path:
-                    # Export markers and embed stills in the specified Excel file
-                    export_markers(
-                        currentTimeline, output_path, timecodes, excel_filename, metadata_list, selected_fields, image_size
-                    )
-                    print("DONE")
-                    # Open the output directory in Finder or Explorer
-                    open_folder_in_explorer(output_path)
-    else:
+    # Show the combined user input dialog
+    dialog = create_user_input_dialog(all_fields, currentTimeline.GetStartTimecode() or "01:00:00:00")
+    if dialog.exec() != QtWidgets.QDialog.Accepted:
         print("Operation cancelled.")
+        return
+
+    options = dialog.get_values()
+    if not options.selected_fields:
+        print("No metadata fields selected.")
+        return
+    try:
+        options.marker_filter.validate()
+    except (ValueError, re.error) as error:
+        print(f"Invalid marker filter: {error}")
+        return
+
+    # Use QFileDialog.getSaveFileName to select both filename and location,
+    # up front so the export can start while stills are still being grabbed
+    full_path = get_save_file_name(project_name)
+    if not full_path:
+        print("No output folder and filename selected.")
+        return
+
+    # Decide what happens to an existing folder now (or resume an unfinished run),
+    # so nothing has to be asked once the export is running
+    output = prepare_output(full_path, incremental=options.incremental)
+    if output is None:
+        return
+    options.resume = output.resumed
+
+    # Grab the stills, export them and embed them in the specified Excel file
+    try:
+        run_export(resolve, currentProject, currentTimeline, output.path, output.excel_filename, options, property_cache)
+    except TimeoutError as error:
+        print(f"{error}; the export was stopped. Run it again to resume.")
+        return
+    finally:
+        stop_tracing(trace_path)
+        guard.close()
+    published_path = output.publish()
+    if published_path is None:
+        return
+    print("DONE")
+    # Open the output directory in Finder or Explorer
+    open_folder_in_explorer(published_path)
+
+# Function to parse the headless command line
+def parse_args(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Export the current timeline's markers and stills to an Excel shotlist without dialogs."
+    )
+    parser.add_argument("output", help="path of the .xlsx file; the workbook and stills go into a folder of the same name")
+    parser.add_argument("--fields", default=",".join(DEFAULT_FIELDS), help="comma-separated fields, in column order")
+    parser.add_argument("--size", default="SMALL", help="SMALL, LARGE or a multiplier of the SMALL size (e.g. 1.5)")
+    parser.add_argument("--start-timecode", help="timecode to park the playhead on before grabbing")
+    parser.add_argument(
+        "--on-conflict", choices=("replace", "rename", "cancel"), default="cancel",
+        help="what to do when the output folder already exists",
+    )
+    parser.add_argument("--delete-stills", action="store_true", help="delete all stills from the gallery album first")
+    parser.add_argument("--constant-memory", action="store_true", help="stream rows with the low-memory writer")
+    parser.add_argument("--serial", action="store_true", help="grab, export and write one phase after another")
+    parser.add_argument(
+        "--split-by", choices=("reel", "color", "rows"),
+        help="split the shotlist into sheets by reel, marker color or every --split-rows rows, behind an index sheet",
+    )
+    parser.add_argument("--split-rows", type=int, default=SHARD_ROWS, metavar="N", help="rows per part with --split-by rows")
+    parser.add_argument("--split-workbooks", action="store_true", help="write each part to its own workbook, in parallel")
+    parser.add_argument(
+        "--marker-filter", metavar="FILE",
+        help="JSON marker filter (colors, name, note, ranges, min_duration, max_duration, custom_data)",
+    )
+    parser.add_argument("--colors", help="only markers of these comma-separated colors")
+    parser.add_argument("--name", metavar="REGEX", help="only markers whose name matches")
+    parser.add_argument("--note", metavar="REGEX", help="only markers whose note matches")
+    parser.add_argument(
+        "--range", action="append", metavar="START-END",
+        help="only markers in this timecode or frame range (repeatable)",
+    )
+    parser.add_argument("--min-duration", type=int, metavar="FRAMES", help="only markers at least this long")
+    parser.add_argument("--max-duration", type=int, metavar="FRAMES", help="only markers at most this long")
+    custom_data = parser.add_mutually_exclusive_group()
+    custom_data.add_argument("--with-custom-data", dest="custom_data", action="store_const", const=True)
+    custom_data.add_argument("--without-custom-data", dest="custom_data", action="store_const", const=False)
+    parser.add_argument(
+        "--thumbnail-format", choices=("png", "png8", "jpeg"), default="png",
+        help="encoding of the embedded thumbnails (png8 is a 256-color palette PNG)",
+    )
+    parser.add_argument("--thumbnail-quality", type=int, default=THUMBNAIL_QUALITY, help="JPEG quality (1-100)")
+    parser.add_argument(
+        "--size-budget", type=float, metavar="MB",
+        help="target workbook size; thumbnails step down to palette PNG and lower JPEG quality to fit",
+    )
+    parser.add_argument(
+        "--dedup-stills", action="store_true",
+        help="make and embed one thumbnail per group of identical-looking stills",
+    )
+    parser.add_argument(
+        "--contact-sheet", metavar="FORMATS",
+        help="also write contact sheets next to the workbook: comma-separated pdf, html, mosaic",
+    )
+    parser.add_argument(
+        "--thumbnail-cache", action="store_true",
+        help="reuse thumbnails cached per source frame by earlier runs (leave it off after regrading)",
+    )
+    parser.add_argument("--thumbnail-cache-dir", metavar="DIR", help="folder of the shared thumbnail cache")
+    parser.add_argument(
+        "--thumbnail-cache-size", type=float, default=THUMBNAIL_CACHE_SIZE / 1048576, metavar="MB",
+        help="size cap of the thumbnail cache; least recently used thumbnails are evicted",
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="re-export into the existing output folder, grabbing stills only for markers that changed",
+    )
+    parser.add_argument(
+        "--batch", action="store_true",
+        help="export several timelines (--timelines) of one or more projects (--projects) into one report",
+    )
+    parser.add_argument("--projects", help="comma-separated projects for --batch (default: the current project)")
+    parser.add_argument("--timelines", help="comma-separated timelines for --batch (default: every timeline)")
+    parser.add_argument(
+        "--batch-workbooks", action="store_true",
+        help="with --batch, write a workbook per timeline instead of a sheet per timeline",
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="continue an unfinished run in the output folder instead of applying --on-conflict",
+    )
+    parser.add_argument(
+        "--fake-markers", type=int, metavar="COUNT",
+        help="run against an in-process fake Resolve with COUNT synthetic markers",
+    )
+    parser.add_argument(
+        "--trace", metavar="PATH",
+        help="time every stage and Resolve call, print a summary and save a Chrome trace (JSON) to PATH",
+    )
+    parser.add_argument(
+        "--fake-timelines", type=int, default=1, metavar="COUNT", help="synthetic timelines per fake project",
+    )
+    parser.add_argument("--fake-projects", type=int, default=1, metavar="COUNT", help="synthetic fake projects")
+    parser.add_argument(
+        "--resolve-timeout", type=float, default=RESOLVE_CALL_TIMEOUT, metavar="SECONDS",
+        help="give up on a Resolve call that takes longer (exports of many stills get longer); 0 waits forever",
+    )
+    parser.add_argument(
+        "--resolve-retries", type=int, default=RESOLVE_CALL_RETRIES, metavar="N",
+        help="retries of Resolve calls that returned nothing while Resolve was busy (e.g. GetCurrentVideoItem)",
+    )
+    parser.add_argument("--fake-latency", type=float, default=0.0, metavar="SECONDS", help="duration of each fake Resolve call")
+    return parser.parse_args(argv)
+
+# Function to build the marker filter of the command line: the filter file, if any,
+# with the criteria given as options on top
+def build_marker_filter(args):
+    data = {}
+    if args.marker_filter:
+        with open(args.marker_filter, encoding="utf-8") as filter_file:
+            data = json.load(filter_file)
+    options = {
+        "colors": [color.strip() for color in args.colors.split(",") if color.strip()] if args.colors else None,
+        "name": args.name,
+        "note": args.note,
+        "ranges": args.range,
+        "min_duration": args.min_duration,
+        "max_duration": args.max_duration,
+        "custom_data": args.custom_data,
+    }
+    data.update({key: value for key, value in options.items() if value is not None})
+    marker_filter = MarkerFilter.from_dict(data)
+    return None if marker_filter.is_empty() else marker_filter
+
+# Function to run an export without any dialogs (e.g. on a render node)
+def main_cli(argv=None):
+    args = parse_args(argv)
+    try:
+        marker_filter = build_marker_filter(args)
+    except (OSError, ValueError, TypeError, re.error) as error:
+        print(f"Invalid marker filter: {error}")
+        return 1
+    contact_sheets = [name.strip().lower() for name in (args.contact_sheet or "").split(",") if name.strip()]
+    unknown_formats = [name for name in contact_sheets if name not in CONTACT_SHEET_FORMATS]
+    if unknown_formats:
+        print(f"Unknown contact sheet format: {', '.join(unknown_formats)} (choose from {', '.join(CONTACT_SHEET_FORMATS)})")
+        return 1
+
+    if args.fake_markers:
+        from fake_resolve import create_fake_resolve
+        resolve = create_fake_resolve(
+            args.fake_markers, args.fake_latency, timeline_count=args.fake_timelines, project_count=args.fake_projects
+        )
+    else:
+        resolve = get_resolve()
+    if resolve is None:
+        print("Could not connect to DaVinci Resolve.")
+        return 1
+    if args.trace:
+        resolve = start_tracing().wrap(resolve)
+    # Every Resolve call gets a timeout and retries, so a stalled call can't hang the run
+    guard = None
+    if args.resolve_timeout:
+        guard = ResolveCallGuard(args.resolve_timeout, args.resolve_retries)
+        resolve = guard.wrap(resolve)
+
+    try:
+        currentProject = resolve.GetProjectManager().GetCurrentProject()
+        currentTimeline = currentProject.GetCurrentTimeline() if currentProject else None
+    except TimeoutError as error:
+        print(f"{error}; is Resolve responding?")
+        return 1
+    if currentTimeline is None and not (args.batch and (currentProject or args.projects)):
+        print("No timeline is open.")
+        return 1
+
+    options = ExportOptions(
+        selected_fields=[name.strip() for name in args.fields.split(",") if name.strip()],
+        image_size=get_image_size(args.size),
+        start_timecode=args.start_timecode,
+        delete_stills=args.delete_stills,
+        constant_memory=args.constant_memory,
+        conflict_policy=args.on_conflict,
+        pipelined=not args.serial,
+        incremental=args.incremental,
+        thumbnail_cache=args.thumbnail_cache,
+        thumbnail_cache_path=args.thumbnail_cache_dir,
+        thumbnail_cache_size=int(args.thumbnail_cache_size * 1048576),
+        shard_by=args.split_by,
+        shard_rows=args.split_rows,
+        shard_workbooks=args.split_workbooks,
+        dedup_stills=args.dedup_stills,
+        thumbnail_format=args.thumbnail_format,
+        thumbnail_quality=args.thumbnail_quality,
+        size_budget=args.size_budget,
+        marker_filter=marker_filter,
+        contact_sheets=contact_sheets,
+    )
 
-    # End of the script
+    # The output folder is settled before any Resolve work starts
+    output = prepare_output(args.output, options.conflict_policy, args.resume, options.incremental)
+    if output is None:
+        print("Nothing was exported.")
+        return 1
+    options.resume = output.resumed
+
+    try:
+        if args.batch:
+            timeline_names = [name.strip() for name in args.timelines.split(",") if name.strip()] if args.timelines else None
+            project_names = [name.strip() for name in args.projects.split(",") if name.strip()] if args.projects else [None]
+            targets = [(project_name, timeline_names) for project_name in project_names]
+            run_batch(resolve, targets, output.path, output.excel_filename, options, args.batch_workbooks)
+        else:
+            property_cache = ClipPropertyCache()
+            run_export(
+                resolve, currentProject, currentTimeline, output.path, output.excel_filename, options, property_cache
+            )
+    except TimeoutError as error:
+        print(f"{error}; the export was stopped. Run again with --resume to continue.")
+        return 1
+    finally:
+        stop_tracing(args.trace)
+        if guard is not None:
+            guard.close()
+    published_path = output.publish()
+    if published_path is None:
+        return 1
+    print("DONE")
+    print(os.path.join(published_path, output.excel_filename))
+    return 0
+
+if __name__ == "__main__":
+    # Any command-line arguments select the headless mode
+    if len(sys.argv) > 1:
+        sys.exit(main_cli())
+    main_gui()
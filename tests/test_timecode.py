@@ -0,0 +1,91 @@
+# Natalia Raz
+# Tests for the batch frame/timecode conversion, checked against a reference that counts
+# timecodes up one frame at a time and skips the dropped frame numbers.
+# Usage: python -m pytest tests
+
+import os
+import sys
+
+import pytest
+
+# Repository root, where shotlist_creator2.py lives
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_PATH)
+
+import shotlist_creator2 as shotlist
+
+# Every rate is counted just past its first hour, which crosses every kind of minute boundary
+REFERENCE_MINUTES = 61
+
+# Start frame of a timeline starting at 01:00:00:00 (at 24 fps), as Resolve timelines do by default
+START_FRAME = 86400
+
+# Function to count timecodes up from 00:00:00:00 one frame at a time, skipping the frame
+# numbers dropped at the start of every minute except every tenth minute
+def reference_timecodes(nominal, dropped, count):
+    separator = ";" if dropped else ":"
+    hours = minutes = seconds = frame = 0
+    timecodes = []
+    for _ in range(count):
+        timecodes.append(f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{frame:02d}")
+        frame += 1
+        if frame == nominal:
+            frame = 0
+            seconds += 1
+        if seconds == 60:
+            seconds = 0
+            minutes += 1
+            if minutes % 10:
+                frame = dropped
+        if minutes == 60:
+            minutes = 0
+            hours += 1
+    return timecodes
+
+@pytest.mark.parametrize("rate", sorted(shotlist.TIMECODE_RATES))
+def test_frames_match_reference(rate):
+    nominal, dropped = shotlist.TIMECODE_RATES[rate]
+    expected = reference_timecodes(nominal, dropped, nominal * 60 * REFERENCE_MINUTES)
+    frames = list(range(len(expected)))
+    assert shotlist.frames_to_timecodes(frames, rate) == expected
+    assert shotlist.timecodes_to_frames(expected, rate) == frames
+
+@pytest.mark.parametrize("rate", sorted(shotlist.TIMECODE_RATES))
+def test_round_trip_with_start_frame(rate):
+    nominal = shotlist.TIMECODE_RATES[rate][0]
+    # Marker frames are relative to the timeline start; include the last frame before midnight
+    frames = list(range(0, nominal * 3600 * 2, 997)) + [nominal * 3600 * 23 - 1]
+    timecodes = shotlist.frames_to_timecodes(frames, rate, start_frame=START_FRAME)
+    assert shotlist.timecodes_to_frames(timecodes, rate, start_frame=START_FRAME) == frames
+
+@pytest.mark.parametrize("frame, timecode", [
+    (1799, "00:00:59;29"),
+    (1800, "00:01:00;02"),
+    (17981, "00:09:59;29"),
+    (17982, "00:10:00;00"),
+    (107892, "01:00:00;00"),
+])
+def test_drop_frame_anchors(frame, timecode):
+    assert shotlist.frames_to_timecodes([frame], 29.97, drop_frame=True) == [timecode]
+    assert shotlist.timecodes_to_frames([timecode], 29.97, drop_frame=True) == [frame]
+
+def test_start_frame_offsets_timecodes():
+    assert shotlist.frames_to_timecodes([0, 24], 24, start_frame=START_FRAME) == ["01:00:00:00", "01:00:01:00"]
+
+@pytest.mark.parametrize("fps, drop_frame, expected", [
+    (29.97, True, (30, 2)),
+    ("29.97 DF", False, (30, 2)),
+    (59.94, True, (60, 4)),
+    (23.976, True, (24, 0)),
+    (25.0, False, (25, 0)),
+    (48, False, (48, 0)),
+])
+def test_timecode_rate(fps, drop_frame, expected):
+    assert shotlist.timecode_rate(fps, drop_frame) == expected
+
+def test_float_marker_frames():
+    assert shotlist.frames_to_timecodes([47.0], 24) == ["00:00:01:23"]
+
+def test_same_timecode_ignores_separator():
+    assert shotlist.same_timecode("00:01:00;02", "00:01:00:02")
+    assert not shotlist.same_timecode("00:01:00;02", None)